@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import pandas as pd
+from metrics import stage
+
+DELTA_THRESHOLD = float(os.getenv("DELTA_THRESHOLD", "1000000"))
+ZSCORE_WINDOW = int(os.getenv("ZSCORE_WINDOW", "96"))
+
+# Rule thresholds per meter type. ENG meters are cumulative energy registers, PWR meters
+# report instantaneous power, so rollback only applies to ENG. None disables a rule.
+DEFAULT_THRESHOLDS = {
+    "ENG": {
+        "abs_delta": DELTA_THRESHOLD,
+        "rollback": 0.0,
+        "flatline_run": 96,
+        "gap": "6h",
+        "zscore": 10.0,
+    },
+    "PWR": {
+        "abs_delta": DELTA_THRESHOLD,
+        "rollback": None,
+        "flatline_run": 96,
+        "gap": "6h",
+        "zscore": 10.0,
+    },
+}
+DEFAULT_THRESHOLDS["default"] = DEFAULT_THRESHOLDS["ENG"]
+CUMULATIVE_TYPES = {"ENG", "default"}
+
+OUTPUT_COLUMNS = [
+    "meter_name", "meter_id", "site_name", "previous_value", "current_value", "delta",
+    "previous_time", "current_time", "rule", "meter_type",
+]
+
+# Scales MAD to a standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+
+def meter_type(meter_name):
+    name = (meter_name or "").upper()
+    if "ENG" in name:
+        return "ENG"
+    if "PWR" in name:
+        return "PWR"
+    return "default"
+
+def _threshold_columns(types, thresholds):
+    # Broadcast per-type thresholds onto every reading row
+    table = pd.DataFrame.from_dict(
+        {t: {**thresholds["default"], **thresholds.get(t, {})} for t in types.unique()}, orient="index"
+    )
+    return table.reindex(types.values).reset_index(drop=True)
+
+def _events(frame, mask, rule, previous_value, previous_time):
+    hits = frame[mask]
+    return pd.DataFrame({
+        "meter_name": hits["meter_name"],
+        "meter_id": hits["meter_id"],
+        "site_name": hits["site_name"],
+        "previous_value": previous_value[mask],
+        "current_value": hits["value"],
+        "delta": hits["value"] - previous_value[mask],
+        "previous_time": previous_time[mask],
+        "current_time": hits["timestamp"],
+        "rule": rule,
+        "meter_type": hits["meter_type"],
+    })
+
+@stage("detect_anomalies")
+def detect_anomalies(readings, thresholds=None, window=ZSCORE_WINDOW):
+    # readings: one row per reading with meter_id, meter_name, site_name, value,
+    # time (datetime64, NaT if unparseable) and timestamp (display string), in
+    # chronological order within each meter.
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    if readings is None or readings.empty:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    frame = readings.reset_index(drop=True).copy()
+    frame["meter_type"] = frame["meter_name"].map(meter_type)
+    limits = _threshold_columns(frame["meter_type"], thresholds)
+    groups = frame.groupby("meter_id", sort=False)
+
+    previous_value = groups["value"].shift()
+    previous_time = groups["timestamp"].shift()
+    delta = frame["value"] - previous_value
+    has_previous = previous_value.notna()
+    events = []
+
+    abs_limit = pd.to_numeric(limits["abs_delta"], errors="coerce")
+    events.append(_events(frame, has_previous & (delta.abs() > abs_limit), "abs_delta", previous_value, previous_time))
+
+    rollback_limit = pd.to_numeric(limits["rollback"], errors="coerce")
+    cumulative = frame["meter_type"].isin(CUMULATIVE_TYPES)
+    events.append(_events(frame, has_previous & cumulative & (delta < -rollback_limit), "rollback", previous_value, previous_time))
+
+    # Data gaps: consecutive valid timestamps further apart than the allowed gap
+    gap_limit = pd.to_timedelta(limits["gap"], errors="coerce")
+    elapsed = frame["time"] - groups["time"].shift()
+    events.append(_events(frame, elapsed > gap_limit, "gap", previous_value, previous_time))
+
+    # Flatline: runs of identical consecutive values, reported once per run (start -> end)
+    new_run = (delta != 0) | ~has_previous
+    run_id = new_run.cumsum()
+    run_length = run_id.map(run_id.value_counts())
+    run_limit = pd.to_numeric(limits["flatline_run"], errors="coerce")
+    run_end = run_id.ne(run_id.shift(-1))
+    run_start_time = frame["timestamp"].groupby(run_id).transform("first")
+    run_start_value = frame["value"].groupby(run_id).transform("first")
+    events.append(_events(frame, run_end & (run_length >= run_limit), "flatline", run_start_value, run_start_time))
+
+    # Spikes: robust z-score of consumption (cumulative) or value (instantaneous)
+    # against a rolling median / MAD
+    signal = delta.where(cumulative, frame["value"])
+    if window > 1:
+        by_meter = signal.groupby(frame["meter_id"], sort=False)
+        median = by_meter.transform(lambda s: s.rolling(window, min_periods=window // 2).median())
+        deviation = (signal - median).abs()
+        mad = deviation.groupby(frame["meter_id"], sort=False).transform(
+            lambda s: s.rolling(window, min_periods=window // 2).median()
+        )
+        zscore = deviation / (MAD_SCALE * mad.replace(0, np.nan))
+        z_limit = pd.to_numeric(limits["zscore"], errors="coerce")
+        events.append(_events(frame, has_previous & (zscore > z_limit), "spike", previous_value, previous_time))
+
+    events = [e for e in events if not e.empty]
+    if not events:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    result = pd.concat(events)
+    # Keep each meter's events in reading order
+    return result.sort_index(kind="stable").reset_index(drop=True)[OUTPUT_COLUMNS]
@@ -1,89 +1,125 @@
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import time
 import os
 import json
+import threading
+import time
+from urllib.parse import urlparse
 from tqdm import tqdm
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.oauth2.credentials import Credentials
+from fetch_engine import FetchEngine
+from c3ntinel_client import get_client
+from token_manager import get_token_manager
+from timestamps import READING_TIME_FIELDS, parse_epoch_ms, format_ms
+from metadata_cache import get_metadata_cache, site_key, properties_key, SITE_CACHE_TTL, PROPERTIES_CACHE_TTL
+from temperature_service import get_temperature_service
+from readings_store import ReadingsStore, to_iso
+from sharded_fetch import ShardedFetch, ShardResponse
+from report_writer import REPORT_FORMAT, REPORT_OUTPUT_DIR, open_report_writer, report_filename
+from checkpoint import RunCheckpoint, make_run_id
+from metrics import stage, record_rows, run_summary
+from drive_upload import DRIVE_FOLDER_ID, get_drive_uploader
+from scheduler import last_month_window, previous_window
+from meter_search import MeterListing
 
 # C3ntinel credentials
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-BASE_API = "https://api.c3ntinel.com/2"
-
+BASE_API = os.getenv("C3NTINEL_BASE_API", "https://api.c3ntinel.com/2")
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "0") == "1"
+# Set DRIVE_UPLOAD=0 to keep reports local (e.g. benchmarks against the mock API)
+DRIVE_UPLOAD = os.getenv("DRIVE_UPLOAD", "1") != "0"
+API_HOST = urlparse(BASE_API).netloc
+# Meter search behind the CDD report
+METER_QUERY = os.getenv("METER_QUERY", "is:cumulative")
+
+@stage("api.get_token")
 def get_token():
-    url = "https://auth.c3ntinel.com/sso/oauth/token"
-    payload = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
     try:
-        r = requests.post(url, data=payload, headers=headers)
-        r.raise_for_status()
-        return r.json()["access_token"]
+        return get_token_manager(CLIENT_ID, CLIENT_SECRET).get_token()
     except requests.RequestException as e:
         print(f"⚠️ Failed to get token: {e}")
         raise
 
-def get_meters(token, query="is:cumulative"):
-    url = f"{BASE_API}/meter/search"
+@stage("api.get_meter_page")
+def get_meter_page(token, query, page=None, size=None, url=None):
     headers = {"Authorization": f"Bearer {token}"}
-    params = {"query": query}
+    if url is None:
+        url = f"{BASE_API}/meter/search"
+        params = {"query": query, "page": page, "size": size}
+    else:
+        # HAL next links already carry the query and page
+        params = None
     try:
-        r = requests.get(url, headers=headers, params=params)
+        r = get_client().get(url, headers=headers, params=params)
         r.raise_for_status()
-        return r.json()["_embedded"]["meters"]
+        return r.json()
     except requests.RequestException as e:
         print(f"⚠️ Failed to get meters: {e}")
         raise
 
+def iter_meters(token, query=METER_QUERY):
+    # Meters stream in page by page; processing can start before the listing ends
+    return MeterListing(lambda **page: get_meter_page(token, query, **page))
+
+def get_meters(token, query=METER_QUERY):
+    return list(iter_meters(token, query))
+
+@stage("api.get_meter_readings")
 def get_meter_readings(token, meter_id, start_date, end_date):
+    # Returns a ShardResponse: the data, or {} and whether the failure may pass if retried
     url = f"{BASE_API}/meter/{meter_id}/readings"
     headers = {"Authorization": f"Bearer {token}"}
     params = {"start_date": start_date, "end_date": end_date}
     try:
-        r = requests.get(url, headers=headers, params=params)
+        began = time.monotonic()
+        r = get_client().get(url, headers=headers, params=params)
+        # Backoff and Retry-After sleeps are the API asking us to wait, not a slow window
+        seconds = time.monotonic() - began - r.retry_wait
         if r.status_code != 200:
             print(f"❌ {meter_id} returned {r.status_code}: {r.text}")
-            return {}
-        data = r.json()
+            return ShardResponse({}, seconds, transient=r.status_code >= 500)
+        with stage("parse_json"):
+            data = r.json()
         if not data.get("readings"):
             print(f"⚠️ Meter {meter_id} returned no readings between {start_date} and {end_date}")
-        return data
+        return ShardResponse(data, seconds)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        print(f"⚠️ Request failed for meter {meter_id}: {e}")
+        print(f"URL: {url}")
+        return ShardResponse({}, None, transient=True)
     except requests.RequestException as e:
         print(f"⚠️ Request failed for meter {meter_id}: {e}")
         print(f"URL: {url}")
-        return {}
+        return ShardResponse({}, None)
 
 
+@stage("api.get_meter_properties")
 def get_meter_properties(token, meter_id):
     url = f"{BASE_API}/meter/{meter_id}/properties/current"
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        r = requests.get(url, headers=headers)
+        r = get_client().get(url, headers=headers)
         r.raise_for_status()
         return r.json()
     except requests.RequestException as e:
         print(f"⚠️ Failed to get properties for meter {meter_id}: {e}")
         return {}
 
+@stage("api.get_site_info")
 def get_site_info(token, site_id):
     url = f"{BASE_API}/site/{site_id}"
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        r = requests.get(url, headers=headers)
+        r = get_client().get(url, headers=headers)
         r.raise_for_status()
         return r.json()
     except requests.RequestException as e:
         print(f"⚠️ Failed to get site info for site {site_id}: {e}")
         return {}
 
-def get_temperature_data(token, import_code, start_date, end_date):
+@stage("api.get_temperature_readings")
+def get_temperature_readings(token, import_code, start_date, end_date):
     url = f"{BASE_API}/rawdata"
     headers = {"Authorization": f"Bearer {token}"}
     params = {
@@ -92,60 +128,257 @@ def get_temperature_data(token, import_code, start_date, end_date):
         "end_date": end_date
     }
     try:
-        r = requests.get(url, headers=headers, params=params)
+        r = get_client().get(url, headers=headers, params=params)
         r.raise_for_status()
-        data = r.json()
-        temps_by_date = {}
-        for reading in data.get("readings", []):
-            ts = reading.get("time")
-            if ts is None:
-                continue
-            dt = datetime.utcfromtimestamp(ts / 1000).strftime("%Y-%m-%d")
-            temps_by_date[dt] = reading.get("value")
-        return temps_by_date
+        return r.json().get("readings", [])
     except requests.RequestException as e:
         print(f"⚠️ Could not get temperature data for import code {import_code}, status {getattr(e.response, 'status_code', 'unknown')}: {e}")
         print(f"Request URL: {url}")
         print(f"Request Params: {params}")
-        if r.status_code == 401:
+        if getattr(e.response, "status_code", None) == 401:
             print(f"⚠️ Authentication error for import code {import_code}, skipping")
-        return {}
+        return []
+
+def upload_to_drive(filename, drive_filename="latest_ceentiel_report.csv", folder_id=DRIVE_FOLDER_ID, mimetype="text/csv"):
+    # Queues the upload in the background and returns its Future (None when uploads are
+    # off); pass the futures to wait_for_uploads() before exiting
+    if not DRIVE_UPLOAD:
+        print(f"⏭️ Drive upload disabled, keeping {filename} local")
+        return None
+    return get_drive_uploader().submit(filename, drive_filename, folder_id, mimetype)
+
+def wait_for_uploads(futures):
+    futures = [f for f in futures if f is not None]
+    if futures:
+        get_drive_uploader().wait(futures)
+
+def upload_report(filename, fmt=REPORT_FORMAT):
+    mimetype = "application/vnd.apache.parquet" if fmt == "parquet" else "text/csv"
+    return upload_to_drive(filename, drive_filename=os.path.basename(filename), mimetype=mimetype)
+
+DEFAULT_PROBLEM_CODES = {
+    "RAKEMS_FLAYASH_LVRMGND_MDB1ENRG",
+    "RAKEMS_FLAYASH_LVRMGND_MDB1ENRG_EX",
+    "RAKEMS_FLAYASH_LVRMGND_DBAC1ENRG",
+    "S4PRAKA_BSH_CH1_CIR2_ENERGY"
+}
+# Comma-separated PROBLEM_CODES replaces the default set
+PROBLEM_CODES = {code.strip() for code in os.getenv("PROBLEM_CODES", "").split(",") if code.strip()} or DEFAULT_PROBLEM_CODES
+
+def cached_meter_properties(engine, token, meter_id):
+    return get_metadata_cache().get_or_fetch(
+        properties_key(meter_id),
+        lambda: engine.call(API_HOST, get_meter_properties, token, meter_id),
+        ttl=PROPERTIES_CACHE_TTL,
+    )
+
+def cached_site_info(engine, token, site_id):
+    return get_metadata_cache().get_or_fetch(
+        site_key(site_id),
+        lambda: engine.call(API_HOST, get_site_info, token, site_id),
+        ttl=SITE_CACHE_TTL,
+    )
+
+def cached_daily_temperatures(engine, token, import_code, start_date, end_date):
+    return get_temperature_service().daily_table(
+        import_code, start_date, end_date,
+        lambda: engine.call(API_HOST, get_temperature_readings, token, import_code, start_date, end_date),
+    )
+
+class MeterReadingsFuture:
+    # Readings for one meter, fetched as concurrent date-range shards. With a store,
+    # only the parts of the window it hasn't synced yet are downloaded and the full
+    # window is then read back from the store.
+    def __init__(self, engine, token, meter_id, start_date, end_date, store=None):
+        self.meter_id = meter_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.store = store
+        if store:
+            windows = [(to_iso(lo), to_iso(hi)) for lo, hi in store.missing_ranges(meter_id, start_date, end_date)]
+        else:
+            windows = [(start_date, end_date)]
+        fetch = lambda start, end: get_meter_readings(token, meter_id, start, end)
+        self._shards = [ShardedFetch(engine, API_HOST, fetch, start, end) for start, end in windows]
+        self._lock = threading.Lock()
+        self._done = False
+        self._result = None
+
+    def result(self):
+        with self._lock:
+            if not self._done:
+                self._result = self._gather()
+                self._done = True
+            return self._result
+
+    def _gather(self):
+        results = [shards.result() for shards in self._shards]
+        fetched = [(shards, readings) for shards, readings in zip(self._shards, results) if readings is not None]
+        failed_windows = [w for shards in self._shards for w in shards.failed_windows]
+        if fetched and failed_windows:
+            windows = ", ".join(f"{to_iso(lo)} - {to_iso(hi)}" for lo, hi in failed_windows)
+            print(f"⚠️ Meter {self.meter_id} is missing readings for {windows}")
+        if self.store is None:
+            return {"readings": results[0]} if fetched else {}
+        if fetched:
+            readings = [r for _, chunk in fetched for r in chunk]
+            windows = [(shards.start_ms, shards.end_ms) for shards, _ in fetched]
+            self.store.save_readings(self.meter_id, readings, windows, failed_windows)
+        elif self._shards and self.store.sync_state(self.meter_id) is None:
+            return {}
+        elif self._shards:
+            print(f"⚠️ Sync failed for meter {self.meter_id}, using stored readings only")
+        return {"readings": self.store.load_readings(self.meter_id, self.start_date, self.end_date)}
+
+def metadata_columns(meter_props, site_info, n):
+    # Flatten meter/site metadata once and broadcast it as single-category columns
+    meta = pd.json_normalize({"meter_properties": meter_props or {}, "site_info": site_info or {}})
+    columns = {}
+    for col in meta.columns:
+        value = meta.at[0, col]
+        try:
+            if value is None or pd.isna(value):
+                columns[col] = pd.Series([None] * n, dtype=object)
+                continue
+            categories = pd.Index([value])
+        except (TypeError, ValueError):
+            # Lists and other unhashable values can't be categories
+            columns[col] = pd.Series([value] * n, dtype=object)
+            continue
+        columns[col] = pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=categories)
+    return columns
+
+@stage("build_frame")
+def build_meter_frame(meter, meter_props, site_info, readings, daily_temps=None):
+    # Filtering before framing keeps integer values from being upcast to float
+    frame = pd.DataFrame.from_records([r for r in readings if r.get("value") is not None])
+    if frame.empty:
+        return None
+
+    # Wall-clock time the API reported, from date and then time/timestamp
+    epoch_ms = np.zeros(len(frame), dtype=np.int64)
+    invalid = np.ones(len(frame), dtype=bool)
+    for col in READING_TIME_FIELDS:
+        if col in frame:
+            col_ms, col_invalid = parse_epoch_ms(frame[col], wall_clock=True)
+            fill = invalid & ~col_invalid
+            epoch_ms[fill] = col_ms[fill]
+            invalid &= col_invalid
+    frame = frame.drop(columns=["time", "timestamp"], errors="ignore")
+    frame["date"] = format_ms(epoch_ms, invalid).to_numpy()
+
+    frame["meter_id"] = meter.get("meterId")
+    frame["meter_name"] = meter.get("name")
+    frame["site_id"] = meter.get("siteId")
+    if daily_temps is not None and not daily_temps.empty:
+        days = pd.Series(format_ms(epoch_ms, invalid, "%Y-%m-%d").to_numpy(), index=frame.index)
+        frame["mdt"] = days.map(daily_temps["mdt"])
+        frame["cdd"] = days.map(daily_temps["cdd"])
+    else:
+        frame["mdt"] = None
+        frame["cdd"] = None
+
+    # Same column layout json_normalize produced: nested metadata after the flat fields
+    metadata = pd.DataFrame(metadata_columns(meter_props, site_info, len(frame)), index=frame.index)
+    return pd.concat([frame, metadata], axis=1)
+
+def submit_meter_readings(engine, token, meter_id, start_date, end_date, store=None):
+    return MeterReadingsFuture(engine, token, meter_id, start_date, end_date, store)
+
+def fetch_meter_frame(engine, token, meter, start_date, end_date, problem_codes=PROBLEM_CODES, store=None, readings_future=None):
+    meter_id = meter.get("meterId")
+    site_id = meter.get("siteId")
+    meter_name = meter.get("name")
+    print(f"Processing meter {meter_id} ({meter_name})")
+
+    # Properties, site and readings are independent; temperature needs the import code
+    props_future = engine.submit(None, cached_meter_properties, engine, token, meter_id)
+    site_future = engine.submit(None, cached_site_info, engine, token, site_id)
+    if readings_future is None:
+        readings_future = submit_meter_readings(engine, token, meter_id, start_date, end_date, store)
+
+    meter_props = props_future.result()
+    import_code = meter_props.get("importCode") if meter_props else None
+    print(f"Import code for meter {meter_id}: {import_code}")
+    if import_code and import_code not in problem_codes:
+        temperature_future = engine.submit(None, cached_daily_temperatures, engine, token, import_code, start_date, end_date)
+    else:
+        temperature_future = None
+
+    site_info = site_future.result()
+    readings_resp = readings_future.result()
+    daily_temps = temperature_future.result() if temperature_future else None
 
-def upload_to_drive(filename, drive_filename="latest_ceentiel_report.csv", folder_id="1pZBBKGMxyk5-QEH3ef4QwkuXFx8H3vF6"):
-    SCOPES = ['https://www.googleapis.com/auth/drive.file']
+    if not readings_resp or "readings" not in readings_resp:
+        print(f"⚠️ Skipping meter {meter_id} due to empty or failed readings")
+        return None
+
+    frame = build_meter_frame(meter, meter_props, site_info, readings_resp["readings"], daily_temps)
+    if frame is None:
+        print(f"⚠️ No valid readings for meter {meter_id}, skipping")
+    return frame
+
+def write_meter_frames(token, meters, start_date, end_date, writer, desc="Fetching meter data", concurrency=None, rate_limit=None, store=None, progress=None, checkpoint=None, total=None):
+    # Frames are written in listing order as soon as the meters before them are done, so
+    # the same data always gives the same file (and an unchanged report skips the upload).
+    # `meters` may be a lazy listing; pass `total` when len() isn't available.
+    skipped_meters = []
+    with FetchEngine(concurrency=concurrency, rate_limit=rate_limit) as engine:
+        fetch = lambda meter: fetch_meter_frame(engine, token, meter, start_date, end_date, store=store)
+        for _, meter, frame in tqdm(engine.map_meters(meters, fetch, ordered=True), total=len(meters) if total is None else total, desc=desc):
+            if frame is None:
+                skipped_meters.append(meter.get("meterId"))
+            else:
+                record_rows("report", len(frame))
+                if checkpoint:
+                    with stage("checkpoint"):
+                        checkpoint.record(meter.get("meterId"), frame)
+                with stage("write_report"):
+                    writer.write(frame)
+            if progress:
+                progress.meter_done(rows=0 if frame is None else len(frame), error=frame is None)
+    get_metadata_cache().save()
+    return skipped_meters
+
+def build_report(token, meters, start_date, end_date, filename, fmt=REPORT_FORMAT, desc="Fetching meter data", resume=False, **fetch_options):
+    progress = fetch_options.get("progress")
+    writer = open_report_writer(filename, fmt)
+    checkpoint = None
     try:
-        creds = Credentials(
-            None,
-            refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-            client_id=os.getenv("GOOGLE_CLIENT_ID"),
-            client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-            token_uri="https://oauth2.googleapis.com/token",
-            scopes=SCOPES
+        # Only under the writer's lock: a fresh run wipes the checkpoint of its run id, which
+        # covers everything that decides the rows (dates, format, tenant, meters, codes)
+        run_id = make_run_id("report", start_date, end_date, fmt, CLIENT_ID, METER_QUERY, ",".join(sorted(PROBLEM_CODES)))
+        checkpoint = RunCheckpoint(run_id, resume=resume)
+        if checkpoint.completed:
+            print(f"⏩ Resuming run {checkpoint.run_id}: {len(checkpoint.completed)} meters already done")
+        for _, frame in checkpoint.chunks():
+            writer.write(frame)
+            if progress:
+                progress.meter_done(rows=len(frame))
+        remaining = (m for m in meters if not checkpoint.is_done(m.get("meterId")))
+        skipped_meters = write_meter_frames(
+            token, remaining, start_date, end_date, writer, desc=desc, checkpoint=checkpoint,
+            total=max(0, len(meters) - len(checkpoint.completed)), **fetch_options
         )
-        service = build('drive', 'v3', credentials=creds)
-        query = f"name = '{drive_filename}' and '{folder_id}' in parents and trashed = false"
-        response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        files = response.get('files', [])
-        media = MediaFileUpload(filename, mimetype='text/csv')
-        if files:
-            file_id = files[0]['id']
-            updated_file = service.files().update(fileId=file_id, media_body=media).execute()
-            print(f"📤 Updated existing file: {drive_filename}")
-            print(f"🔗 View File: https://drive.google.com/file/d/{file_id}/view")
-        else:
-            file_metadata = {'name': drive_filename, 'parents': [folder_id]}
-            new_file = service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
-            print(f"📤 Uploaded new file: {drive_filename}")
-            print(f"🔗 View File: {new_file.get('webViewLink')}")
-    except Exception as e:
-        print(f"⚠️ Failed to upload to Google Drive: {e}")
+    except BaseException:
+        # Keep the last good report; this run's progress survives in the checkpoint
+        writer.abort()
+        if checkpoint:
+            checkpoint.close()
         raise
-
-def main(start_date="2025-06-01T00:00:00.000+00:00", end_date="2025-07-01T00:00:00.000+00:00"):
-    # rest of your code
-
+    rows = writer.close()
+    checkpoint.close()
+    checkpoint.finish()
+    return rows, skipped_meters
+
+@run_summary("CDD report")
+def main(start_date=None, end_date=None, concurrency=None, rate_limit=None, incremental=INCREMENTAL_SYNC, fmt=REPORT_FORMAT, progress=None, resume=False, fallback=None):
+    # Only a defaulted window falls back to the period before it, unless told otherwise
+    if fallback is None:
+        fallback = start_date is None or end_date is None
+    if start_date is None or end_date is None:
+        start_date, end_date = last_month_window()
     token = None
-    skipped_meters = []
     try:
         token = get_token()
         print("✅ Authenticated")
@@ -153,174 +386,68 @@ def main(start_date="2025-06-01T00:00:00.000+00:00", end_date="2025-07-01T00:00:
         print(f"⚠️ Authentication failed: {e}")
         return
 
-    meters = get_meters(token)
+    meters = iter_meters(token)
     print(f"✅ Found {len(meters)} meters")
+    if progress:
+        progress.add_total(len(meters))
 
     print(f"Fetching data for {start_date} to {end_date}")
 
-    all_readings = []
-    problem_codes = {
-        "RAKEMS_FLAYASH_LVRMGND_MDB1ENRG",
-        "RAKEMS_FLAYASH_LVRMGND_MDB1ENRG_EX",
-        "RAKEMS_FLAYASH_LVRMGND_DBAC1ENRG",
-        "S4PRAKA_BSH_CH1_CIR2_ENERGY"
-    }
-
-    for meter in tqdm(meters, desc="Fetching meter data"):
-        meter_id = meter.get("meterId")
-        site_id = meter.get("siteId")
-        meter_name = meter.get("name")
-        print(f"Processing meter {meter_id} ({meter_name})")
-
-        meter_props = get_meter_properties(token, meter_id)
-        import_code = meter_props.get("importCode") if meter_props else None
-        print(f"Import code for meter {meter_id}: {import_code}")
+    store = ReadingsStore() if incremental else None
+    if store:
+        print(f"🔁 Incremental sync using {store.path}")
+    fetch_options = {"concurrency": concurrency, "rate_limit": rate_limit, "store": store, "progress": progress}
 
-        site_info = get_site_info(token, site_id)
-        temperature_map = {} if import_code in problem_codes else get_temperature_data(token, import_code, start_date, end_date) if import_code else {}
-
-        readings_resp = get_meter_readings(token, meter_id, start_date, end_date)
-        if not readings_resp or "readings" not in readings_resp:
-            print(f"⚠️ Skipping meter {meter_id} due to empty or failed readings")
-            skipped_meters.append(meter_id)
-            continue
-
-        readings = readings_resp["readings"]
-        valid_readings = [r for r in readings if r.get("value") is not None]
-        if not valid_readings:
-            print(f"⚠️ No valid readings for meter {meter_id}, skipping")
-            skipped_meters.append(meter_id)
-            continue
-
-        for r in valid_readings:
-            raw_date = r.get("date")
-            raw_time = r.get("time") or r.get("timestamp")
-            dt_obj = None
-            try:
-                if raw_date:
-                    dt_obj = datetime.fromisoformat(raw_date.replace("Z", "+00:00"))
-                elif isinstance(raw_time, (int, float)):
-                    dt_obj = datetime.utcfromtimestamp(raw_time / 1000)
-            except Exception as e:
-                print(f"⚠️ Timestamp parse error for meter {meter_name}: {e}")
-            r["date"] = dt_obj.strftime("%Y-%m-%d %H:%M:%S") if dt_obj else None
-            r.pop("time", None)
-            r.pop("timestamp", None)
-
-            reading_day = r["date"][:10] if r["date"] else None
-            temp = temperature_map.get(reading_day)
-            mdt = temp
-            cdd = max(0, temp - 18) if temp is not None else None
-
-            r["meter_id"] = meter_id
-            r["meter_name"] = meter_name
-            r["site_id"] = site_id
-            r["meter_properties"] = meter_props
-            r["site_info"] = site_info
-            r["mdt"] = mdt
-            r["cdd"] = cdd
-
-            all_readings.append(r)
-
-        time.sleep(0.5)
-
-    output_dir = "public"
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, "latest_ceentiel_report.csv")
-    if all_readings:
-        df = pd.json_normalize(all_readings)
-        df.to_csv(filename, index=False)
-        print(f"✅ Saved {len(df)} rows to {filename}")
-        upload_to_drive(filename)
+    filename = report_filename(REPORT_OUTPUT_DIR, "latest_ceentiel_report", fmt)
+    rows, skipped_meters = build_report(token, meters, start_date, end_date, filename, fmt, resume=resume, **fetch_options)
+    if rows:
+        print(f"✅ Saved {rows} rows to {filename}")
     else:
-        print("⚠️ No valid readings collected, CSV not generated")
-        pd.DataFrame().to_csv(filename, index=False)
-        upload_to_drive(filename)
+        print("⚠️ No valid readings collected, empty report generated")
+    uploads = [upload_report(filename, fmt)]
 
     if skipped_meters:
         print(f"⚠️ Skipped meters due to errors: {skipped_meters}")
 
-    # Fallback to May 1-June 1, 2025 if no data
-    if not all_readings:
-        print("⚠️ Retrying with fallback date range: 2025-05-01 to 2025-06-01")
-        all_readings = []
-        skipped_meters = []
-        fallback_start = "2025-05-01"
-        fallback_end = "2025-06-01"
-        for meter in tqdm(meters, desc="Fetching meter data (fallback)"):
-            meter_id = meter.get("meterId")
-            site_id = meter.get("siteId")
-            meter_name = meter.get("name")
-            print(f"Processing meter {meter_id} ({meter_name})")
-
-            meter_props = get_meter_properties(token, meter_id)
-            import_code = meter_props.get("importCode") if meter_props else None
-            print(f"Import code for meter {meter_id}: {import_code}")
-
-            site_info = get_site_info(token, site_id)
-            temperature_map = {} if import_code in problem_codes else get_temperature_data(token, import_code, fallback_start, fallback_end) if import_code else {}
-
-            readings_resp = get_meter_readings(token, meter_id, fallback_start, fallback_end)
-            if not readings_resp or "readings" not in readings_resp:
-                print(f"⚠️ Skipping meter {meter_id} due to empty or failed readings")
-                skipped_meters.append(meter_id)
-                continue
-
-            readings = readings_resp["readings"]
-            valid_readings = [r for r in readings if r.get("value") is not None]
-            if not valid_readings:
-                print(f"⚠️ No valid readings for meter {meter_id}, skipping")
-                skipped_meters.append(meter_id)
-                continue
-
-            for r in valid_readings:
-                raw_date = r.get("date")
-                raw_time = r.get("time") or r.get("timestamp")
-                dt_obj = None
-                try:
-                    if raw_date:
-                        dt_obj = datetime.fromisoformat(raw_date.replace("Z", "+00:00"))
-                    elif isinstance(raw_time, (int, float)):
-                        dt_obj = datetime.utcfromtimestamp(raw_time / 1000)
-                except Exception as e:
-                    print(f"⚠️ Timestamp parse error for meter {meter_name}: {e}")
-                r["date"] = dt_obj.strftime("%Y-%m-%d %H:%M:%S") if dt_obj else None
-                r.pop("time", None)
-                r.pop("timestamp", None)
-
-                reading_day = r["date"][:10] if r["date"] else None
-                temp = temperature_map.get(reading_day)
-                mdt = temp
-                cdd = max(0, temp - 18) if temp is not None else None
-
-                r["meter_id"] = meter_id
-                r["meter_name"] = meter_name
-                r["site_id"] = site_id
-                r["meter_properties"] = meter_props
-                r["site_info"] = site_info
-                r["mdt"] = mdt
-                r["cdd"] = cdd
-
-                all_readings.append(r)
-
-            time.sleep(0.5)
-
-        if all_readings:
-            df = pd.json_normalize(all_readings)
-            df.to_csv(filename, index=False)
-            print(f"✅ Saved {len(df)} rows to {filename} (fallback range)")
-            upload_to_drive(filename)
+    # No data yet for the requested period: report the one before it instead
+    if not rows and fallback:
+        fallback_start, fallback_end = previous_window(start_date, end_date)
+        print(f"⚠️ Retrying with fallback date range: {fallback_start} to {fallback_end}")
+        if progress:
+            progress.add_total(len(meters))
+        rows, skipped_meters = build_report(
+            token, meters, fallback_start, fallback_end, filename, fmt,
+            desc="Fetching meter data (fallback)", resume=resume, **fetch_options
+        )
+        if rows:
+            print(f"✅ Saved {rows} rows to {filename} (fallback range)")
         else:
-            print("⚠️ No valid readings in fallback range, empty CSV generated")
-            pd.DataFrame().to_csv(filename, index=False)
-            upload_to_drive(filename)
+            print("⚠️ No valid readings in fallback range, empty report generated")
+        uploads.append(upload_report(filename, fmt))
 
         if skipped_meters:
             print(f"⚠️ Skipped meters in fallback range: {skipped_meters}")
 
-def run():
-    print("Running report for 2025-06-01 to 2025-07-01")
-    main()
+    if store:
+        store.close()
+    wait_for_uploads(uploads)
+
+def run(start_date=None, end_date=None, incremental=INCREMENTAL_SYNC, progress=None, resume=False):
+    # Defaults to the last complete month. Explicit windows (scheduled runs) report
+    # exactly that window, so an empty one never overwrites the report with an older period
+    fallback = start_date is None or end_date is None
+    if fallback:
+        start_date, end_date = last_month_window()
+    print(f"Running report for {start_date} to {end_date}")
+    main(start_date, end_date, incremental=incremental, progress=progress, resume=resume, fallback=fallback)
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the C3ntinel MDT/CDD readings report")
+    parser.add_argument("--start", required=False, help="Start date (ISO); defaults to the last complete month")
+    parser.add_argument("--end", required=False, help="End date (ISO)")
+    parser.add_argument("--incremental", action="store_true", default=INCREMENTAL_SYNC, help="Only download readings newer than the local store")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=REPORT_FORMAT, help="Report file format")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run for the same dates and format")
+    args = parser.parse_args()
+    main(args.start, args.end, incremental=args.incremental, fmt=args.format, resume=args.resume)
@@ -0,0 +1,237 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+
+# Local stand-in for api.c3ntinel.com and its OAuth endpoint, with a synthetic fleet
+API_PREFIX = "/2"
+TOKEN_PATH = "/sso/oauth/token"
+DEFAULT_START = "2025-06-01T00:00:00Z"
+DEFAULT_END = "2025-07-01T00:00:00Z"
+
+
+class MockConfig:
+    def __init__(self, meters=200, meters_per_site=10, interval_minutes=30, latency_ms=20,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, spike_rate=0.001, seed=42):
+        self.meters = meters
+        self.meters_per_site = meters_per_site
+        self.interval_minutes = interval_minutes
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.spike_rate = spike_rate
+        self.seed = seed
+
+
+def _parse_ms(value, default):
+    value = value or default
+    if value.isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class MockFleet:
+    def __init__(self, config):
+        self.config = config
+
+    def meter(self, meter_id):
+        kind = "ENG" if meter_id % 2 else "PWR"
+        return {
+            "meterId": meter_id,
+            "siteId": 1000 + meter_id // self.config.meters_per_site,
+            "name": f"MOCK_{meter_id:05d}_{kind}",
+        }
+
+    def meters(self):
+        return [self.meter(i) for i in range(1, self.config.meters + 1)]
+
+    def readings(self, meter_id, start_ms, end_ms):
+        step = self.config.interval_minutes * 60 * 1000
+        first = -(-start_ms // step) * step
+        # Cumulative register: deterministic per meter and timestamp, so shards agree
+        readings = []
+        for ts in range(first, end_ms, step):
+            rng = random.Random(self.config.seed * 1_000_003 + meter_id * 7919 + ts // step)
+            value = round(ts / step * (1 + meter_id % 7) + rng.random(), 3)
+            if rng.random() < self.config.spike_rate:
+                value += 5_000_000
+            readings.append({"date": _iso(ts), "value": value})
+        return readings
+
+    def temperatures(self, import_code, start_ms, end_ms):
+        step = 3600 * 1000
+        first = -(-start_ms // step) * step
+        seed = sum(map(ord, import_code))
+        return [
+            {"time": ts, "value": round(28 + 8 * random.Random(seed + ts // step).random(), 2)}
+            for ts in range(first, end_ms, step)
+        ]
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        self.config = config
+        self.fleet = MockFleet(config)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+        super().__init__(address, MockHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, **increments):
+        with self.stats_lock:
+            self.stats.update(increments)
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats.clear()
+
+    def roll(self):
+        with self.stats_lock:
+            return self._rng.random()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = [
+        (re.compile(rf"^{API_PREFIX}/meter/search$"), "search"),
+        (re.compile(rf"^{API_PREFIX}/meter/(\d+)/readings$"), "readings"),
+        (re.compile(rf"^{API_PREFIX}/meter/(\d+)/properties/current$"), "properties"),
+        (re.compile(rf"^{API_PREFIX}/site/(\d+)$"), "site"),
+        (re.compile(rf"^{API_PREFIX}/rawdata$"), "rawdata"),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(requests=1, bytes=len(data), **{f"status_{status}": 1})
+
+    def _inject_faults(self):
+        config = self.server.config
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000)
+        roll = self.server.roll()
+        if roll < config.throttle_rate:
+            self._send(429, {"error": "rate limited"}, {"Retry-After": str(config.retry_after)})
+            return True
+        if roll < config.throttle_rate + config.error_rate:
+            self._send(503, {"error": "unavailable"})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if urlparse(self.path).path != TOKEN_PATH:
+            return self._send(404, {"error": "not found"})
+        self.server.count(token=1)
+        self._send(200, {"access_token": f"mock-{time.time_ns()}", "token_type": "bearer", "expires_in": 3600})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        for pattern, name in self.routes:
+            match = pattern.match(parsed.path)
+            if match:
+                break
+        else:
+            return self._send(404, {"error": "not found"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(401, {"error": "unauthorized"})
+        self.server.count(**{f"endpoint_{name}": 1})
+        if self._inject_faults():
+            return
+        getattr(self, f"_{name}")(match, params)
+
+    def _search(self, match, params):
+        meters = self.server.fleet.meters()
+        query = params.get("query", "")
+        if "PWR" in query or "ENG" in query:
+            meters = [m for m in meters if m["name"].endswith(("_PWR", "_ENG"))]
+        # Spring HAL paging: zero-based page, with a next link while more remain
+        size = int(params.get("size") or len(meters) or 1)
+        number = int(params.get("page") or 0)
+        total_pages = max(1, -(-len(meters) // size))
+        body = {
+            "_embedded": {"meters": meters[number * size:(number + 1) * size]},
+            "page": {"size": size, "totalElements": len(meters), "totalPages": total_pages, "number": number},
+            "_links": {},
+        }
+        if number + 1 < total_pages:
+            query_string = urlencode({"query": query, "page": number + 1, "size": size})
+            body["_links"]["next"] = {"href": f"http://{self.headers.get('Host')}{API_PREFIX}/meter/search?{query_string}"}
+        self._send(200, body)
+
+    def _readings(self, match, params):
+        start_ms = _parse_ms(params.get("start_date"), DEFAULT_START)
+        end_ms = _parse_ms(params.get("end_date"), DEFAULT_END)
+        readings = self.server.fleet.readings(int(match.group(1)), start_ms, end_ms)
+        self.server.count(readings=len(readings))
+        self._send(200, {"readings": readings})
+
+    def _properties(self, match, params):
+        meter_id = int(match.group(1))
+        self._send(200, {"importCode": f"WEATHER_{meter_id // 50}", "unit": "kWh", "multiplier": 1})
+
+    def _site(self, match, params):
+        site_id = int(match.group(1))
+        self._send(200, {"siteId": site_id, "name": f"Mock Site {site_id}", "timezone": "Asia/Dubai"})
+
+    def _rawdata(self, match, params):
+        start_ms = _parse_ms(params.get("start_date"), DEFAULT_START)
+        end_ms = _parse_ms(params.get("end_date"), DEFAULT_END)
+        self._send(200, {"readings": self.server.fleet.temperatures(params.get("import_code", ""), start_ms, end_ms)})
+
+
+def start_mock_server(config=None, host="127.0.0.1", port=0):
+    server = MockServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-c3ntinel").start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a mock C3ntinel API for local testing")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--meters", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=30, help="Minutes between readings")
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = start_mock_server(MockConfig(
+        meters=args.meters, interval_minutes=args.interval, latency_ms=args.latency_ms,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+    ), port=args.port)
+    print(f"Mock C3ntinel API on {server.url}{API_PREFIX} (token: {server.url}{TOKEN_PATH})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
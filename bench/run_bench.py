@@ -0,0 +1,122 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    from bench.mock_api import API_PREFIX, TOKEN_PATH, MockConfig, start_mock_server
+except ImportError:
+    from mock_api import API_PREFIX, TOKEN_PATH, MockConfig, start_mock_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario runs in a fresh interpreter so wall time and peak RSS are its own
+SCENARIOS = {
+    "automation": "import automation; automation.main({start!r}, {end!r})",
+    "faulty": "import detect_faulty_metres; detect_faulty_metres.main({start!r}, {end!r})",
+    "combined": "import pipeline; pipeline.main({start!r}, {end!r})",
+}
+
+
+def count_rows(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+def run_scenario(name, server, workdir, start, end, extra_env=None):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "C3NTINEL_BASE_API": f"{server.url}{API_PREFIX}",
+        "C3NTINEL_AUTH_URL": f"{server.url}{TOKEN_PATH}",
+        "CLIENT_ID": "bench", "CLIENT_SECRET": "bench",
+        "FAULTY_CLIENT_ID": "bench", "FAULTY_CLIENT_SECRET": "bench",
+        "DRIVE_UPLOAD": "0",
+        "C3NTINEL_CACHE_DIR": os.path.join(workdir, "cache"),
+        "RUNS_DIR": os.path.join(workdir, "runs"),
+    })
+    env.update(extra_env or {})
+    code = SCENARIOS[name].format(start=start, end=end)
+
+    server.reset_stats()
+    log_path = os.path.join(workdir, f"{name}.log")
+    began = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, "-c", code], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - began
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    stats = dict(server.stats)
+    requests_made = stats.get("requests", 0)
+    readings = stats.get("readings", 0)
+    return {
+        "scenario": name,
+        "exit_code": proc.returncode,
+        "wall_s": round(wall, 2),
+        "requests": requests_made,
+        "requests_per_s": round(requests_made / wall, 1) if wall else 0,
+        "readings_downloaded": readings,
+        "rows_per_s": round(readings / wall, 1) if wall else 0,
+        "report_rows": count_rows(os.path.join(workdir, "public", "latest_ceentiel_report.csv")),
+        "faulty_rows": count_rows(os.path.join(workdir, "public", "faulty_meter_deltas.csv")),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "mb_downloaded": round(stats.get("bytes", 0) / 1e6, 1),
+        "errors_injected": stats.get("status_429", 0) + stats.get("status_503", 0),
+        "log": log_path,
+    }
+
+def print_table(results):
+    columns = ["scenario", "exit_code", "wall_s", "requests", "requests_per_s", "readings_downloaded",
+               "rows_per_s", "report_rows", "faulty_rows", "peak_rss_mb", "mb_downloaded", "errors_injected"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the reports end-to-end against a local mock C3ntinel API")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["automation", "faulty"])
+    parser.add_argument("--meters", type=int, default=200, help="Fleet size")
+    parser.add_argument("--interval", type=int, default=30, help="Minutes between readings")
+    parser.add_argument("--latency-ms", type=int, default=20, help="Added latency per API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument("--start", default="2025-06-01T00:00:00.000+00:00")
+    parser.add_argument("--end", default="2025-07-01T00:00:00.000+00:00")
+    parser.add_argument("--warm", action="store_true", help="Run each scenario twice and report the warm-cache run")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory with outputs and logs")
+    args = parser.parse_args(argv)
+
+    server = start_mock_server(MockConfig(
+        meters=args.meters, interval_minutes=args.interval, latency_ms=args.latency_ms,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+    ))
+    workdir = tempfile.mkdtemp(prefix="c3ntinel-bench-")
+    print(f"Mock API on {server.url}, scratch dir {workdir}")
+    results = []
+    try:
+        for name in args.scenarios:
+            if args.warm:
+                run_scenario(name, server, workdir, args.start, args.end)
+            results.append(run_scenario(name, server, workdir, args.start, args.end))
+    finally:
+        server.shutdown()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if not args.keep:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0 if all(r["exit_code"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
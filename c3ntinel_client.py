@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from fetch_engine import MAX_CONCURRENCY, REQUESTS_PER_METER
+from token_manager import manager_for
+from metrics import record_response
+from common import process_singleton
+
+# HTTP settings shared by every C3ntinel API call
+REQUEST_TIMEOUT = float(os.getenv("C3NTINEL_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("C3NTINEL_MAX_RETRIES", "5"))
+BACKOFF_FACTOR = float(os.getenv("C3NTINEL_BACKOFF", "0.5"))
+POOL_SIZE = int(os.getenv("C3NTINEL_POOL_SIZE", str(MAX_CONCURRENCY * REQUESTS_PER_METER)))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_waits = threading.local()
+
+
+class _TimedRetry(Retry):
+    # Tallies the backoff and Retry-After time slept in the calling thread, so callers
+    # can tell time spent waiting from time the server took
+    def sleep(self, response=None):
+        began = time.monotonic()
+        try:
+            super().sleep(response)
+        finally:
+            _waits.seconds = getattr(_waits, "seconds", 0.0) + time.monotonic() - began
+
+
+class C3ntinelClient:
+    # One keep-alive session per process; urllib3 handles exponential backoff
+    # and waits out Retry-After on 429/503 before giving up.
+    def __init__(self, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR, pool_size=POOL_SIZE):
+        self.timeout = timeout
+        retry = _TimedRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+    def request(self, method, url, headers=None, **kwargs):
+        # Bearer tokens issued by a TokenManager act as handles: the manager's current
+        # token is sent, and a 401 triggers one refresh and retry. The response's
+        # retry_wait is the seconds spent sleeping between retries.
+        kwargs.setdefault("timeout", self.timeout)
+        _waits.seconds = 0.0
+        headers = dict(headers or {})
+        auth = headers.get("Authorization", "")
+        manager = manager_for(auth[7:]) if auth.startswith("Bearer ") else None
+        if manager:
+            headers["Authorization"] = f"Bearer {manager.get_token()}"
+        r = self._send(method, url, headers, kwargs)
+        if r.status_code == 401 and manager:
+            stale = headers["Authorization"][7:]
+            headers["Authorization"] = f"Bearer {manager.refresh(stale)}"
+            r = self._send(method, url, headers, kwargs)
+        r.retry_wait = _waits.seconds
+        return r
+
+    def _send(self, method, url, headers, kwargs):
+        began = time.perf_counter()
+        r = None
+        try:
+            r = self.session.request(method, url, headers=headers, **kwargs)
+            return r
+        finally:
+            record_response(method, url, r, time.perf_counter() - began, streamed=kwargs.get("stream", False))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+get_client = process_singleton(C3ntinelClient)
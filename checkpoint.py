@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import pandas as pd
+
+# Per-run state so an interrupted report can pick up where it stopped
+RUNS_DIR = os.getenv("RUNS_DIR", "runs")
+
+
+def make_run_id(name, *params):
+    # Same report + parameters -> same run id, so a rerun finds the previous checkpoint
+    digest = hashlib.sha1("|".join(str(p) for p in params).encode("utf-8")).hexdigest()[:12]
+    return f"{name}-{digest}"
+
+
+class RunCheckpoint:
+    # Each completed meter's frame is pickled under runs/<run_id>/chunks and logged to
+    # completed.jsonl; a resumed run replays those chunks and fetches only the rest.
+    def __init__(self, run_id, resume=False, base_dir=RUNS_DIR):
+        self.run_id = run_id
+        self.dir = os.path.join(base_dir, run_id)
+        self.chunks_dir = os.path.join(self.dir, "chunks")
+        self.log_path = os.path.join(self.dir, "completed.jsonl")
+        if not resume:
+            shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self.completed = self._load()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _load(self):
+        completed = {}
+        if not os.path.exists(self.log_path):
+            return completed
+        with open(self.log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a torn last line
+                    continue
+                if os.path.exists(os.path.join(self.chunks_dir, entry["chunk"])):
+                    completed[entry["meter_id"]] = entry["chunk"]
+        return completed
+
+    def is_done(self, meter_id):
+        return str(meter_id) in self.completed
+
+    def record(self, meter_id, frame):
+        meter_id = str(meter_id)
+        chunk = re.sub(r"[^A-Za-z0-9_.-]", "_", meter_id) + ".pkl"
+        path = os.path.join(self.chunks_dir, chunk)
+        frame.to_pickle(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self._log.write(json.dumps({"meter_id": meter_id, "chunk": chunk, "rows": len(frame)}) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self.completed[meter_id] = chunk
+
+    def chunks(self):
+        for meter_id, chunk in list(self.completed.items()):
+            yield meter_id, pd.read_pickle(os.path.join(self.chunks_dir, chunk))
+
+    def close(self):
+        if not self._log.closed:
+            self._log.close()
+
+    def finish(self):
+        # The report file now holds everything; the checkpoint is no longer needed
+        self.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+# Tokens, caches, the readings store and upload/scheduler state live under here
+CACHE_DIR = os.getenv("C3NTINEL_CACHE_DIR", "cache")
+
+
+def save_json(path, data, mode=0o666, **dump_options):
+    # Written aside and moved into place, so a crash never leaves a half-written file.
+    # mode (before the umask) e.g. 0o600 keeps a token cache private.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_options)
+    os.replace(tmp_path, path)
+
+
+def process_singleton(factory):
+    # Returns a getter for one instance per process, created on first use
+    instance = None
+    lock = threading.Lock()
+
+    def get():
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+    return get
+
+
+class InflightCalls:
+    # Concurrent calls for the same key share one run of fn: the first caller runs it,
+    # the rest wait for its result (or exception)
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -1,69 +1,89 @@
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import time
 import os
-from automation import upload_to_drive
+from automation import iter_meters, upload_to_drive, wait_for_uploads
+from c3ntinel_client import get_client
+from token_manager import get_token_manager
+from metadata_cache import get_metadata_cache, site_key, SITE_CACHE_TTL
+from anomaly_engine import detect_anomalies
+from timestamps import parse_epoch_ms, is_text_time, to_datetime, format_ms
+from report_writer import REPORT_OUTPUT_DIR, open_report_writer
+from metrics import stage, record_rows, run_summary
+from scheduler import last_month_window
 
 # Ceentiel credentials
 CLIENT_ID = os.getenv("FAULTY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("FAULTY_CLIENT_SECRET")
-BASE_API = "https://api.c3ntinel.com/2"
-
-DELTA_THRESHOLD = 1000000
+BASE_API = os.getenv("C3NTINEL_BASE_API", "https://api.c3ntinel.com/2")
+# Meter search behind the fault report; names are then filtered by FAULT_TAGS
+FAULT_QUERY = os.getenv("FAULT_METER_QUERY", "PWR or ENG")
 
+@stage("api.get_token")
 def get_token():
-    url = "https://auth.c3ntinel.com/sso/oauth/token"
-    payload = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
     try:
-        r = requests.post(url, data=payload, headers=headers)
-        r.raise_for_status()
-        return r.json()["access_token"]
+        return get_token_manager(CLIENT_ID, CLIENT_SECRET).get_token()
     except requests.RequestException as e:
         print(f"⚠️ Failed to get token: {e}")
         raise
 
 def get_meters(token):
-    url = f"{BASE_API}/meter/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"query": "PWR or ENG"}
-    try:
-        r = requests.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        return r.json()["_embedded"]["meters"]
-    except requests.RequestException as e:
-        print(f"⚠️ Failed to get meters: {e}")
-        raise
+    # Paged listing shared with the CDD report; iterating it streams the pages
+    return iter_meters(token, FAULT_QUERY)
 
+@stage("api.get_meter_readings")
 def get_meter_readings(token, meter_id, start_date, end_date):
     url = f"{BASE_API}/meter/{meter_id}/readings"
     headers = {"Authorization": f"Bearer {token}"}
     params = {"start_date": start_date, "end_date": end_date}
     try:
-        r = requests.get(url, headers=headers, params=params)
+        r = get_client().get(url, headers=headers, params=params)
         if r.status_code == 200:
-            return r.json().get("readings", [])
+            with stage("parse_json"):
+                return r.json().get("readings", [])
         return []
     except requests.RequestException as e:
-        print(f"⚠️ Failed to get readings for meter {meter_id}: {e}, status: {r.status_code}")
+        print(f"⚠️ Failed to get readings for meter {meter_id}: {e}, status: {getattr(e.response, 'status_code', 'unknown')}")
         return []
 
+@stage("api.get_site_info")
 def get_site_info(token, site_id):
     url = f"{BASE_API}/site/{site_id}"
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        r = requests.get(url, headers=headers)
+        r = get_client().get(url, headers=headers)
         return r.json() if r.status_code == 200 else {}
     except requests.RequestException as e:
         print(f"⚠️ Failed to get site info for site {site_id}: {e}")
         return {}
 
-def main(start_date="2025-06-01", end_date="2025-07-01"):
+FAULT_TAGS = ["ENG", "PWR"]
+
+def is_fault_candidate(meter_name):
+    return any(tag in (meter_name or "").upper() for tag in FAULT_TAGS)
+
+@stage("readings_frame")
+def readings_frame(meter_id, meter_name, site_name, readings):
+    frame = pd.DataFrame.from_records(readings, columns=["date", "value"])
+    frame["value"] = pd.to_numeric(frame["value"], errors="coerce")
+    frame = frame[frame["value"].notna()]
+    # "date" is either an ISO string (kept as-is for display) or epoch milliseconds
+    epoch_ms, invalid = parse_epoch_ms(frame["date"])
+    time = to_datetime(epoch_ms, invalid, utc=True).set_axis(frame.index)
+    formatted = format_ms(epoch_ms, invalid, fallback="Invalid timestamp").to_numpy()
+    return pd.DataFrame({
+        "meter_id": meter_id,
+        "meter_name": meter_name,
+        "site_name": site_name,
+        "value": frame["value"],
+        "time": time,
+        "timestamp": np.where(is_text_time(frame["date"]), frame["date"].to_numpy(), formatted),
+    })
+
+@run_summary("Faulty meters report")
+def main(start_date=None, end_date=None, progress=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = last_month_window()
     token = get_token()
     print("✅ Authenticated with Ceentiel")
 
@@ -71,84 +91,68 @@ def main(start_date="2025-06-01", end_date="2025-07-01"):
 
     meters = get_meters(token)
     print(f"🔍 Scanning {len(meters)} meters...")
+    if progress:
+        progress.add_total(len(meters))
 
-    faulty_meters = []
+    frames = []
 
     for i, meter in enumerate(meters, start=1):
         meter_id = meter.get("meterId")
         site_id = meter.get("siteId")
         meter_name = meter.get("name")
 
-        if not any(tag in meter_name.upper() for tag in ["ENG", "PWR"]):
+        if not is_fault_candidate(meter_name):
             print(f"[{i}/{len(meters)}] ❌ Skipping {meter_name}")
+            if progress:
+                progress.meter_done()
             continue
 
-        site_info = get_site_info(token, site_id)
+        site_info = get_metadata_cache().get_or_fetch(
+            site_key(site_id), lambda: get_site_info(token, site_id), ttl=SITE_CACHE_TTL
+        )
         site_name = site_info.get("name", "Unknown")
 
         readings = get_meter_readings(token, meter_id, start_date, end_date)
         if not readings:
             print(f"[{i}/{len(meters)}] ⚠️ No readings for {meter_name}, skipping")
+            if progress:
+                progress.meter_done(error=True)
             continue
 
-        previous_value = None
-        previous_time = None
-
-        for reading in readings:
-            value = reading.get("value")
-            ts = reading.get("date")
-
-            try:
-                value = float(value)
-            except:
-                continue
-
-            try:
-                timestamp = ts if isinstance(ts, str) else datetime.utcfromtimestamp(ts / 1000).strftime("%Y-%m-%d %H:%M:%S")
-            except:
-                timestamp = "Invalid timestamp"
-
-            if previous_value is not None:
-                delta = abs(value - previous_value)
-                if delta > DELTA_THRESHOLD:
-                    faulty_meters.append({
-                        "meter_name": meter_name,
-                        "meter_id": meter_id,
-                        "site_name": site_name,
-                        "previous_value": previous_value,
-                        "current_value": value,
-                        "delta": delta,
-                        "previous_time": previous_time,
-                        "current_time": timestamp
-                    })
-
-            previous_value = value
-            previous_time = timestamp
-
+        frames.append(readings_frame(meter_id, meter_name, site_name, readings))
+        record_rows("faulty", len(frames[-1]))
         print(f"[{i}/{len(meters)}] ✅ Checked {meter_name}")
-        time.sleep(0.3)
-
-    output_dir = "public"
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, "faulty_meter_deltas.csv")
-    if faulty_meters:
-        df = pd.DataFrame(faulty_meters)
-        df.to_csv(filename, index=False)
-        print(f"\n🚨 Faulty meters with abnormal jumps found! Saved to '{filename}'")
-        upload_to_drive(filename, drive_filename="faulty_meter_deltas.csv", folder_id="1pZBBKGMxyk5-QEH3ef4QwkuXFx8H3vF6")
+        if progress:
+            progress.meter_done(rows=len(frames[-1]))
+
+    get_metadata_cache().save()
+
+    faulty = detect_anomalies(pd.concat(frames, ignore_index=True) if frames else None)
+    wait_for_uploads([save_faulty_report(faulty)])
+
+def save_faulty_report(faulty):
+    filename = os.path.join(REPORT_OUTPUT_DIR, "faulty_meter_deltas.csv")
+    # Through the report writer: the faulty and combined reports both write this file
+    writer = open_report_writer(filename, "csv")
+    writer.write(faulty)
+    writer.close()
+    if not faulty.empty:
+        counts = ", ".join(f"{rule}: {n}" for rule, n in faulty["rule"].value_counts().items())
+        print(f"\n🚨 Faulty meters found ({counts})! Saved to '{filename}'")
     else:
         print("\n✅ No spikes detected.")
-        pd.DataFrame().to_csv(filename, index=False)
-        upload_to_drive(filename, drive_filename="faulty_meter_deltas.csv", folder_id="1pZBBKGMxyk5-QEH3ef4QwkuXFx8H3vF6")
+    return upload_to_drive(filename, drive_filename="faulty_meter_deltas.csv")
 
-def run():
-    print("Running faulty meters report for 2025-06-01 to 2025-07-01")
-    main()
+def run(start_date=None, end_date=None, progress=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = last_month_window()
+    print(f"Running faulty meters report for {start_date} to {end_date}")
+    main(start_date, end_date, progress=progress)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Detect abnormal delta jumps in Ceentiel meters")
-    parser.add_argument("--start", required=False, default="2025-06-01T00:00:00.000Z", help="Start date (ISO)")
-    parser.add_argument("--end", required=False, default="2025-07-01T00:00:00.000Z", help="End date (ISO)")
+    parser.add_argument("--start", required=False, help="Start date (ISO); defaults to the last complete month")
+    parser.add_argument("--end", required=False, help="End date (ISO)")
     args = parser.parse_args()
     main(args.start, args.end)
\ No newline at end of file
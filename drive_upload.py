@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+from google.oauth2.credentials import Credentials
+from metrics import stage
+from common import CACHE_DIR, process_singleton, save_json
+
+SCOPES = ['https://www.googleapis.com/auth/drive.file']
+DEFAULT_FOLDER_ID = "1pZBBKGMxyk5-QEH3ef4QwkuXFx8H3vF6"
+DRIVE_FOLDER_ID = os.getenv("DRIVE_FOLDER_ID", DEFAULT_FOLDER_ID)
+# Set DRIVE_GZIP=1 to upload reports as <name>.gz
+DRIVE_GZIP = os.getenv("DRIVE_GZIP", "0") == "1"
+# Files larger than one chunk go up as a resumable upload; Drive wants multiples of 256 KiB
+CHUNK_UNIT = 256 * 1024
+CHUNK_SIZE = max(CHUNK_UNIT, int(float(os.getenv("DRIVE_CHUNK_MB", "8")) * 1024 * 1024) // CHUNK_UNIT * CHUNK_UNIT)
+UPLOAD_RETRIES = int(os.getenv("DRIVE_UPLOAD_RETRIES", "5"))
+STATE_FILE = os.path.join(CACHE_DIR, "drive_uploads.json")
+STAGING_DIR = os.path.join(CACHE_DIR, "uploads")
+
+
+def stage_file(filename, staging_dir=STAGING_DIR, compress=False):
+    # One pass over the report: hash the content and copy (or gzip) it aside, so the
+    # upload is unaffected if the report is rewritten while it is still in flight
+    os.makedirs(staging_dir, exist_ok=True)
+    base = os.path.basename(filename)
+    staged = os.path.join(staging_dir, f"{uuid.uuid4().hex[:8]}-{base}" + (".gz" if compress else ""))
+    digest = hashlib.sha256()
+    with open(filename, "rb") as src, open(staged, "wb") as raw:
+        # mtime=0 keeps the gzip bytes identical for identical reports
+        dst = gzip.GzipFile(filename=base, mode="wb", fileobj=raw, mtime=0) if compress else raw
+        try:
+            for block in iter(lambda: src.read(1024 * 1024), b""):
+                digest.update(block)
+                dst.write(block)
+        finally:
+            if compress:
+                dst.close()
+    return staged, digest.hexdigest()
+
+
+class DriveUploader:
+    # Uploads run one at a time on a background thread (the Drive client is not
+    # thread-safe), reusing one Drive service and the file IDs it has resolved.
+    def __init__(self, state_path=STATE_FILE, staging_dir=STAGING_DIR, chunk_size=CHUNK_SIZE, retries=UPLOAD_RETRIES):
+        self.state_path = state_path
+        self.staging_dir = staging_dir
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self._service = None
+        self._state = {}
+        self._queued = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drive-upload")
+        self._load()
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable Drive upload state {self.state_path}: {e}")
+
+    def _save(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            data = dict(self._state)
+        save_json(self.state_path, data)
+
+    def service(self):
+        if self._service is None:
+            creds = Credentials(
+                None,
+                refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
+                client_id=os.getenv("GOOGLE_CLIENT_ID"),
+                client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+                token_uri="https://oauth2.googleapis.com/token",
+                scopes=SCOPES
+            )
+            self._service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        return self._service
+
+    def submit(self, filename, drive_filename, folder_id=DRIVE_FOLDER_ID, mimetype="text/csv", compress=DRIVE_GZIP):
+        # Returns a Future for the Drive file ID; unchanged content is not re-sent
+        if compress:
+            drive_filename, mimetype = f"{drive_filename}.gz", "application/gzip"
+        key = f"{folder_id}/{drive_filename}"
+        staged, digest = stage_file(filename, self.staging_dir, compress)
+        with self._lock:
+            entry = self._state.get(key) or {}
+            unchanged = self._queued.get(key, entry.get("sha256")) == digest
+            if not unchanged:
+                self._queued[key] = digest
+        if unchanged:
+            os.remove(staged)
+            print(f"⏭️ {drive_filename} unchanged since the last upload, skipping")
+            future = Future()
+            future.set_result(entry.get("file_id"))
+            return future
+        return self._pool.submit(self._upload, key, staged, digest, drive_filename, folder_id, mimetype)
+
+    def wait(self, futures):
+        # Blocks until the given uploads finish; raises the first failure. Each run waits
+        # on its own futures only, so it never reports another run's failed upload
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    @stage("upload")
+    def _upload(self, key, staged, digest, drive_filename, folder_id, mimetype):
+        try:
+            file_id = (self._state.get(key) or {}).get("file_id") or self._find(drive_filename, folder_id)
+            try:
+                response = self._send(staged, mimetype, drive_filename, folder_id, file_id)
+            except HttpError as e:
+                # The cached file was deleted or trashed on the Drive side
+                if file_id is None or e.resp.status != 404:
+                    raise
+                response = self._send(staged, mimetype, drive_filename, folder_id, None)
+            created = file_id is None or response["id"] != file_id
+            file_id = response["id"]
+            with self._lock:
+                self._state[key] = {"file_id": file_id, "sha256": digest}
+            self._save()
+            print(f"📤 {'Uploaded new' if created else 'Updated existing'} file: {drive_filename}")
+            print(f"🔗 View File: {response.get('webViewLink') or f'https://drive.google.com/file/d/{file_id}/view'}")
+            return file_id
+        except Exception as e:
+            print(f"⚠️ Failed to upload {drive_filename} to Google Drive: {e}")
+            raise
+        finally:
+            with self._lock:
+                if self._queued.get(key) == digest:
+                    del self._queued[key]
+            os.remove(staged)
+
+    def _find(self, drive_filename, folder_id):
+        query = f"name = '{drive_filename}' and '{folder_id}' in parents and trashed = false"
+        response = self.service().files().list(q=query, spaces='drive', fields='files(id, name)').execute(num_retries=self.retries)
+        files = response.get('files', [])
+        return files[0]['id'] if files else None
+
+    def _send(self, staged, mimetype, drive_filename, folder_id, file_id):
+        size = os.path.getsize(staged)
+        media = MediaFileUpload(staged, mimetype=mimetype, chunksize=self.chunk_size, resumable=size > self.chunk_size)
+        try:
+            return self._execute(media, size, drive_filename, folder_id, file_id)
+        finally:
+            # Release the staged file so it can be removed (Windows keeps open files)
+            media.stream().close()
+
+    def _execute(self, media, size, drive_filename, folder_id, file_id):
+        files = self.service().files()
+        if file_id:
+            request = files.update(fileId=file_id, media_body=media, fields='id, webViewLink')
+        else:
+            file_metadata = {'name': drive_filename, 'parents': [folder_id]}
+            request = files.create(body=file_metadata, media_body=media, fields='id, webViewLink')
+        if not media.resumable():
+            return request.execute(num_retries=self.retries)
+        # Each chunk is retried on its own; a dropped connection resumes from the last acknowledged byte
+        response = None
+        while response is None:
+            progress, response = request.next_chunk(num_retries=self.retries)
+            if progress and response is None:
+                print(f"⬆️ {drive_filename}: {progress.progress():.0%} of {size / 1e6:.1f} MB")
+        return response
+
+
+get_drive_uploader = process_singleton(DriveUploader)
@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from metrics import rate_limit_wait
+
+# Concurrency and rate limit settings for C3ntinel API calls
+MAX_CONCURRENCY = int(os.getenv("C3NTINEL_CONCURRENCY", "8"))
+RATE_LIMIT_PER_SEC = float(os.getenv("C3NTINEL_RATE_LIMIT", "10"))
+REQUESTS_PER_METER = 4
+
+
+def in_listing_order(results):
+    # Holds back meters that finish early until every meter listed before them is out
+    waiting = {}
+    next_index = 0
+    for item in results:
+        waiting[item[0]] = item
+        while next_index in waiting:
+            yield waiting.pop(next_index)
+            next_index += 1
+
+
+class RateLimiter:
+    # Token bucket: allows short bursts up to `burst`, then `rate` calls per second
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate)
+        limiter.acquire()
+
+
+class FetchEngine:
+    # Meters run on one pool, their individual API calls on another, so a meter
+    # task can wait on its own requests without starving the pool it runs on.
+    def __init__(self, concurrency=None, rate_limit=None):
+        self.concurrency = max(1, int(concurrency or MAX_CONCURRENCY))
+        self.limiter = HostRateLimiter(RATE_LIMIT_PER_SEC if rate_limit is None else rate_limit)
+        self._meter_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="meter")
+        self._request_pool = ThreadPoolExecutor(
+            max_workers=self.concurrency * REQUESTS_PER_METER, thread_name_prefix="request"
+        )
+
+    def call(self, host, fn, *args, **kwargs):
+        # host=None skips throttling, e.g. for work served from a local cache
+        if host is not None:
+            began = time.perf_counter()
+            self.limiter.acquire(host)
+            rate_limit_wait.inc(time.perf_counter() - began, host=host)
+        return fn(*args, **kwargs)
+
+    def submit(self, host, fn, *args, **kwargs):
+        return self._request_pool.submit(self.call, host, fn, *args, **kwargs)
+
+    def map_meters(self, meters, fn, ordered=False, failed=None):
+        # Yields (index, meter, result) in completion order, or in listing order with
+        # ordered=True. `meters` may be a lazy iterator: work starts as meters arrive and
+        # results flow while it is consumed. A meter whose fn raises is logged and yields
+        # `failed` instead, so one bad meter doesn't end the run.
+        results = self._map_completed(meters, fn, failed)
+        return in_listing_order(results) if ordered else results
+
+    @staticmethod
+    def _outcome(i, finished, failed):
+        try:
+            return finished.result()
+        except Exception as e:
+            print(f"⚠️ Meter #{i + 1} failed and is skipped: {type(e).__name__}: {e}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            return failed
+
+    def _map_completed(self, meters, fn, failed):
+        done = queue.SimpleQueue()
+        pending = 0
+        for i, meter in enumerate(meters):
+            future = self._meter_pool.submit(fn, meter)
+            future.add_done_callback(lambda f, i=i, meter=meter: done.put((i, meter, f)))
+            pending += 1
+            while True:
+                try:
+                    i_done, meter_done, finished = done.get_nowait()
+                except queue.Empty:
+                    break
+                pending -= 1
+                yield i_done, meter_done, self._outcome(i_done, finished, failed)
+        while pending:
+            i_done, meter_done, finished = done.get()
+            pending -= 1
+            yield i_done, meter_done, self._outcome(i_done, finished, failed)
+
+    def close(self):
+        self._meter_pool.shutdown(wait=True)
+        self._request_pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
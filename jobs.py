@@ -0,0 +1,129 @@
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "100"))
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobProgress:
+    # Handed to report runs so they can publish how far they have got
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.meters_total = 0
+        self.meters_done = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def add_total(self, meters):
+        with self._lock:
+            self.meters_total += meters
+
+    def meter_done(self, rows=0, error=False):
+        with self._lock:
+            self.meters_done += 1
+            self.rows_written += rows
+            if error:
+                self.errors += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "meters_done": self.meters_done,
+                "meters_total": self.meters_total,
+                "rows_written": self.rows_written,
+                "errors": self.errors,
+            }
+
+
+class Job:
+    def __init__(self, kind, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = "queued"
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.progress = JobProgress()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def as_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress.as_dict(),
+        }
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, key=None, **kwargs):
+        # Returns (job, created). A trigger matching a queued or running job joins it
+        key = key or kind
+        with self._lock:
+            existing = self._active_by_key.get(key)
+            if existing is not None and existing.active:
+                return existing, False
+            job = Job(kind, key)
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn, kwargs)
+        return job, True
+
+    def _run(self, job, fn, kwargs):
+        job.status = "running"
+        job.started_at = _now()
+        try:
+            fn(progress=job.progress, **kwargs)
+            job.status = "succeeded"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = _now()
+            with self._lock:
+                if self._active_by_key.get(job.key) is job:
+                    del self._active_by_key[job.key]
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+job_manager = JobManager()
@@ -1,13 +1,38 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, RedirectResponse
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response
 import os
 
 from starlette.responses import JSONResponse
 
 from automation import run as run_report
 from detect_faulty_metres import run as run_faulty_report
+from pipeline import run as run_combined_report
+from jobs import job_manager
+from scheduler import SCHEDULER_ENABLED, Scheduler, load_schedules
+from metrics import render as render_metrics
+from report_files import serve_report_file
+from report_index import REPORT_FIELDS, get_report_index
+from report_writer import REPORT_OUTPUT_DIR
 
-app = FastAPI()
+# Replaces the Windows Task Scheduler job; set SCHEDULER_ENABLED=0 to turn it off
+scheduler = Scheduler(
+    load_schedules(),
+    {"report": run_report, "faulty-report": run_faulty_report, "combined-report": run_combined_report},
+    job_manager,
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    scheduler.stop()
+    job_manager.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
@@ -20,25 +45,80 @@ def status():
 
 
 @app.get("/run-report")
-async def run_report_endpoint():
-    run_report()
-    return {"status": "Report generation triggered"}
+async def run_report_endpoint(resume: bool = False):
+    job, created = job_manager.submit("report", run_report, resume=resume)
+    status = "Report generation triggered" if created else "Report generation already running"
+    return {"status": status, "job_id": job.id}
 
 @app.get("/run-faulty-report")
 async def run_faulty_report_endpoint():
-    run_faulty_report()
-    return {"status": "Faulty report generation triggered"}
+    job, created = job_manager.submit("faulty-report", run_faulty_report)
+    status = "Faulty report generation triggered" if created else "Faulty report generation already running"
+    return {"status": status, "job_id": job.id}
+
+@app.get("/run-combined-report")
+async def run_combined_report_endpoint():
+    job, created = job_manager.submit("combined-report", run_combined_report)
+    status = "Combined report generation triggered" if created else "Combined report generation already running"
+    return {"status": status, "job_id": job.id}
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape target: API latency/status/retries/bytes, stage timing, rows per meter
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/schedules")
+async def list_schedules():
+    return scheduler.as_list()
+
+@app.get("/jobs")
+async def list_jobs():
+    return [job.as_dict() for job in job_manager.list()]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict()
 
 @app.get("/latest_ceentiel_report.csv")
-async def get_report():
-    file_path = "public/latest_ceentiel_report.csv"
+async def get_report(request: Request):
+    file_path = os.path.join(REPORT_OUTPUT_DIR, "latest_ceentiel_report.csv")
     if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="text/csv", filename="latest_ceentiel_report.csv")
+        return await serve_report_file(request, file_path, media_type="text/csv", filename="latest_ceentiel_report.csv")
     return {"error": "File not found"}
 
 @app.get("/faulty_meter_deltas.csv")
-async def get_faulty_report():
-    file_path = "public/faulty_meter_deltas.csv"
+async def get_faulty_report(request: Request):
+    file_path = os.path.join(REPORT_OUTPUT_DIR, "faulty_meter_deltas.csv")
     if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="text/csv", filename="faulty_meter_deltas.csv")
-    return {"error": "File not found"}
\ No newline at end of file
+        return await serve_report_file(request, file_path, media_type="text/csv", filename="faulty_meter_deltas.csv")
+    return {"error": "File not found"}
+
+@app.get("/reports/{name}/query")
+async def query_report(
+    name: str,
+    meter_id: Optional[List[str]] = Query(None),
+    site: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    format: str = Query("csv", pattern="^(csv|json)$"),
+):
+    # Rows of a report filtered by meter, site (id or name) and [start, end), served
+    # from an index that is rebuilt when the report changes
+    if name not in REPORT_FIELDS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    file_path = os.path.join(REPORT_OUTPUT_DIR, f"{name}.csv")
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    index = get_report_index(name, file_path)
+    try:
+        rows = await run_in_threadpool(index.query, meter_id, site, start, end, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "json":
+        return Response(rows.to_json(orient="records"), media_type="application/json")
+    return Response(rows.to_csv(index=False), media_type="text/csv")
\ No newline at end of file
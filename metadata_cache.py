@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from common import CACHE_DIR, InflightCalls, process_singleton, save_json
+
+# Site and meter property metadata changes rarely, so it is cached across runs
+CACHE_FILE = os.path.join(CACHE_DIR, "metadata_cache.json")
+SITE_CACHE_TTL = float(os.getenv("SITE_CACHE_TTL", str(24 * 3600)))
+PROPERTIES_CACHE_TTL = float(os.getenv("PROPERTIES_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("METADATA_CACHE_SIZE", "20000"))
+
+
+def site_key(site_id):
+    return f"site:{site_id}"
+
+def properties_key(meter_id):
+    return f"properties:{meter_id}"
+
+
+class MetadataCache:
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = InflightCalls()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable metadata cache {self.path}: {e}")
+            return
+        with self._lock:
+            # Stored oldest-first, so insertion order restores the LRU order
+            for key, entry in data.items():
+                self._entries[key] = entry
+            self._evict()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._entries)
+            self._dirty = False
+        save_json(self.path, data)
+
+    def _get_locked(self, key, ttl):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if ttl is not None and time.time() - entry["ts"] > ttl:
+            del self._entries[key]
+            self._dirty = True
+            return None
+        self._entries.move_to_end(key)
+        return entry["value"]
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._dirty = True
+
+    def get(self, key, ttl=None):
+        with self._lock:
+            return self._get_locked(key, ttl)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = {"ts": time.time(), "value": value}
+            self._entries.move_to_end(key)
+            self._dirty = True
+            self._evict()
+
+    def get_or_fetch(self, key, fetch, ttl=None):
+        # Concurrent callers for the same key share a single fetch
+        value = self._cached(key, ttl)
+        if value is not None:
+            return value
+        return self._inflight.call(key, lambda: self._fetch(key, fetch, ttl))
+
+    def _cached(self, key, ttl):
+        with self._lock:
+            value = self._get_locked(key, ttl)
+            if value is not None:
+                self.hits += 1
+            return value
+
+    def _fetch(self, key, fetch, ttl):
+        # A fetch for this key may have finished between our lookup and this call
+        value = self._cached(key, ttl)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = fetch()
+        # Failed lookups come back empty; don't let them stick
+        if value:
+            self.put(key, value)
+        return value
+
+
+get_metadata_cache = process_singleton(MetadataCache)
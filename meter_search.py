@@ -0,0 +1,94 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# /meter/search is paged HAL; pages beyond the first are fetched in parallel when the
+# response says how many there are, otherwise _links.next is followed one by one
+METER_PAGE_SIZE = int(os.getenv("METER_PAGE_SIZE", "500"))
+PAGE_CONCURRENCY = int(os.getenv("METER_PAGE_CONCURRENCY", "4"))
+
+
+def page_meters(data):
+    return ((data or {}).get("_embedded") or {}).get("meters") or []
+
+def next_link(data):
+    link = ((data or {}).get("_links") or {}).get("next")
+    return link.get("href") if isinstance(link, dict) else link
+
+
+class MeterListing:
+    # Iterable of meters that streams pages as they arrive and can be iterated again
+    # (later passes replay what was already listed). fetch_page(page=..., size=...) or
+    # fetch_page(url=...) returns the parsed response; the first page is fetched here,
+    # so listing errors surface at construction like the old get_meters call.
+    def __init__(self, fetch_page, page_size=METER_PAGE_SIZE, concurrency=PAGE_CONCURRENCY):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        first = fetch_page(page=0, size=page_size)
+        page = first.get("page") or {}
+        self.total = page.get("totalElements")
+        if self.total is None and not next_link(first):
+            self.total = len(page_meters(first))
+        self._meters = []
+        self._seen = set()
+        self._done = False
+        self._lock = threading.Lock()
+        self._pages = self._iter_pages(first, page)
+
+    def _iter_pages(self, first, page):
+        yield first
+        total_pages = page.get("totalPages")
+        if total_pages and total_pages > 1:
+            base = page.get("number", 0)
+            numbers = range(base + 1, base + total_pages)
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(numbers)), thread_name_prefix="meter-page") as pool:
+                futures = [pool.submit(self.fetch_page, page=n, size=self.page_size) for n in numbers]
+                try:
+                    for future in futures:
+                        yield future.result()
+                finally:
+                    for future in futures:
+                        future.cancel()
+            return
+        url = next_link(first)
+        while url:
+            data = self.fetch_page(url=url)
+            yield data
+            url = next_link(data)
+
+    def _pull(self):
+        # Adds the next page's new meters; False once every page has been read
+        try:
+            data = next(self._pages)
+        except StopIteration:
+            self._done = True
+            self.total = len(self._meters)
+            return False
+        for meter in page_meters(data):
+            meter_id = meter.get("meterId")
+            if meter_id in self._seen:
+                continue
+            self._seen.add(meter_id)
+            self._meters.append(meter)
+        return True
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self._lock:
+                while i >= len(self._meters) and not self._done:
+                    self._pull()
+                if i >= len(self._meters):
+                    return
+                meter = self._meters[i]
+            i += 1
+            yield meter
+
+    def __len__(self):
+        # Known from the first page when the API reports totalElements; otherwise
+        # this has to finish the listing
+        if self.total is None:
+            for _ in self:
+                pass
+        return self.total
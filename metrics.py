@@ -0,0 +1,226 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets, in seconds (latency, stages) and rows (per meter)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+ROW_BUCKETS = (0, 100, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def _labels_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        for key, value in sorted(self.snapshot().items()):
+            yield f"{self.name}{_labels_text(self.label_names, key)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        # labels -> (sum, count)
+        with self._lock:
+            return {key: (state[-2], state[-1]) for key, state in self._values.items()}
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for bound, n in zip(self.buckets + (float("inf"),), state[:len(self.buckets)] + [state[-1]]):
+                yield f"{self.name}_bucket{_labels_text(self.label_names, key, [('le', _number(bound))])} {n}"
+            yield f"{self.name}_sum{_labels_text(self.label_names, key)} {_number(state[-2])}"
+            yield f"{self.name}_count{_labels_text(self.label_names, key)} {state[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+api_latency = registry.register(Histogram(
+    "c3ntinel_api_request_seconds", "C3ntinel API request latency, including urllib3 retries",
+    labels=("endpoint", "method"),
+))
+api_responses = registry.register(Counter(
+    "c3ntinel_api_responses_total", "C3ntinel API responses by final status code ('error' if none)",
+    labels=("endpoint", "status"),
+))
+api_retries = registry.register(Counter(
+    "c3ntinel_api_retries_total", "Retries urllib3 made before the final response", labels=("endpoint",),
+))
+api_bytes = registry.register(Counter(
+    "c3ntinel_api_bytes_total", "Decoded response body bytes downloaded", labels=("endpoint",),
+))
+rate_limit_wait = registry.register(Counter(
+    "c3ntinel_rate_limit_wait_seconds_total", "Thread time spent waiting on the client-side rate limiter", labels=("host",),
+))
+stage_seconds = registry.register(Histogram(
+    "c3ntinel_stage_seconds", "Time spent per pipeline stage call", labels=("stage",), buckets=STAGE_BUCKETS,
+))
+meter_rows = registry.register(Histogram(
+    "c3ntinel_meter_rows", "Rows produced per meter", labels=("report",), buckets=ROW_BUCKETS,
+))
+
+
+def endpoint_label(url):
+    # "/2/meter/123/readings" -> "/2/meter/{id}/readings", so labels stay bounded
+    path = re.sub(r"^[a-z]+://[^/]+", "", url).split("?", 1)[0]
+    return re.sub(r"(?<=[A-Za-z_])/\d+(?=/|$)", "/{id}", path) or "/"
+
+def record_response(method, url, response, elapsed, streamed=False):
+    endpoint = endpoint_label(url)
+    api_latency.observe(elapsed, endpoint=endpoint, method=method)
+    if response is None:
+        api_responses.inc(endpoint=endpoint, status="error")
+        return
+    api_responses.inc(endpoint=endpoint, status=str(response.status_code))
+    retries = getattr(getattr(response.raw, "retries", None), "history", ())
+    if retries:
+        api_retries.inc(len(retries), endpoint=endpoint)
+    if not streamed:
+        # Non-streamed bodies are already read, so this costs nothing
+        api_bytes.inc(len(response.content or b""), endpoint=endpoint)
+
+def record_rows(report, rows):
+    meter_rows.observe(rows, report=report)
+
+@contextmanager
+def stage(name):
+    # Usable as `with stage("write"):` or as a decorator
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - began, stage=name)
+
+def render():
+    return registry.render()
+
+
+def _diff(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+def _diff_pairs(after, before):
+    diff = {}
+    for key, (total, count) in after.items():
+        prev_total, prev_count = before.get(key, (0, 0))
+        if count != prev_count:
+            diff[key] = (total - prev_total, count - prev_count)
+    return diff
+
+def _snapshot():
+    return {
+        "responses": api_responses.snapshot(),
+        "retries": api_retries.snapshot(),
+        "bytes": api_bytes.snapshot(),
+        "waits": rate_limit_wait.snapshot(),
+        "latency": api_latency.snapshot(),
+        "stages": stage_seconds.snapshot(),
+        "rows": meter_rows.snapshot(),
+    }
+
+@contextmanager
+def run_summary(name):
+    # Prints what a run cost once it finishes. Metrics are process-wide, so runs
+    # that overlap in the API process also count each other's requests.
+    before = _snapshot()
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        print_summary(name, time.perf_counter() - began, before, _snapshot())
+
+def print_summary(name, wall, before, after):
+    responses = _diff(after["responses"], before["responses"])
+    latency = _diff_pairs(after["latency"], before["latency"])
+    stages = _diff_pairs(after["stages"], before["stages"])
+    rows = _diff_pairs(after["rows"], before["rows"])
+    requests_made = sum(responses.values())
+    retries = sum(_diff(after["retries"], before["retries"]).values())
+    downloaded = sum(_diff(after["bytes"], before["bytes"]).values())
+    waited = sum(_diff(after["waits"], before["waits"]).values())
+    statuses = {}
+    for (_, status), n in responses.items():
+        statuses[status] = statuses.get(status, 0) + n
+
+    print(f"\n📊 {name} finished in {wall:.1f}s")
+    print(f"   API: {requests_made} requests, {retries} retries, {downloaded / 1e6:.1f} MB, "
+          f"statuses {dict(sorted(statuses.items()))}, {waited:.1f}s thread time rate-limited")
+    by_endpoint = {}
+    for (endpoint, _), (total, count) in latency.items():
+        t, c = by_endpoint.get(endpoint, (0, 0))
+        by_endpoint[endpoint] = (t + total, c + count)
+    for endpoint, (total, count) in sorted(by_endpoint.items(), key=lambda kv: -kv[1][0]):
+        print(f"   {endpoint}: {count} calls, avg {total / count * 1000:.0f} ms")
+    for (report,), (total, count) in sorted(rows.items()):
+        print(f"   {report}: {int(total)} rows from {count} meters")
+    for (stage_name,), (total, count) in sorted(stages.items(), key=lambda kv: -kv[1][0]):
+        print(f"   stage {stage_name}: {total:.2f}s over {count} calls")
@@ -0,0 +1,174 @@
+import threading
+from concurrent.futures import Future
+import pandas as pd
+from tqdm import tqdm
+from automation import (
+    INCREMENTAL_SYNC, METER_QUERY, get_token, iter_meters, cached_site_info, fetch_meter_frame,
+    submit_meter_readings, upload_report, wait_for_uploads,
+)
+from detect_faulty_metres import FAULT_QUERY, readings_frame, save_faulty_report, is_fault_candidate
+from anomaly_engine import detect_anomalies
+from fetch_engine import FetchEngine
+from metadata_cache import get_metadata_cache
+from readings_store import ReadingsStore
+from report_writer import REPORT_FORMAT, REPORT_OUTPUT_DIR, open_report_writer, report_filename
+from metrics import stage, record_rows, run_summary
+from scheduler import last_month_window
+
+class MeterQueryUnion:
+    # Union of several meter searches, iterated once. Meters of the first search stream
+    # out as its pages arrive while the other searches are listed in the background;
+    # meters only a later search found follow at the end. on_more(n) is told each time
+    # the expected count grows.
+    def __init__(self, token, queries, on_more=None):
+        self.queries = list(dict.fromkeys(queries))
+        self.first = iter_meters(token, self.queries[0])
+        self.on_more = on_more
+        self.count = 0
+        self._first_ids = set()
+        self._others = Future()
+        others = [(query, iter_meters(token, query)) for query in self.queries[1:]]
+        threading.Thread(target=self._list_others, args=(others,), daemon=True, name="meter-union").start()
+
+    def _list_others(self, others):
+        try:
+            matched = {}
+            for query, listing in others:
+                for meter in listing:
+                    matched.setdefault(meter.get("meterId"), (meter, set()))[1].add(query)
+            self._others.set_result(matched)
+        except BaseException as e:
+            self._others.set_exception(e)
+
+    def matches(self, meter, query):
+        # Later searches block until they are fully listed, which is normally long
+        # before a meter's readings arrive
+        meter_id = meter.get("meterId")
+        if query == self.queries[0]:
+            return meter_id in self._first_ids
+        _, queries = self._others.result().get(meter_id, (None, ()))
+        return query in queries
+
+    def __iter__(self):
+        if self.on_more:
+            self.on_more(len(self.first))
+        for meter in self.first:
+            self._first_ids.add(meter.get("meterId"))
+            self.count += 1
+            yield meter
+        extras = [meter for meter_id, (meter, _) in self._others.result().items() if meter_id not in self._first_ids]
+        if extras and self.on_more:
+            self.on_more(len(extras))
+        for meter in extras:
+            self.count += 1
+            yield meter
+
+def process_meter(engine, token, meter, meters, start_date, end_date, store=None):
+    # Downloads a meter's readings once and feeds them to whichever report stages want it
+    meter_id = meter.get("meterId")
+    in_report = meters.matches(meter, METER_QUERY)
+    if not (in_report or is_fault_candidate(meter.get("name"))):
+        return None, None
+
+    readings_future = submit_meter_readings(engine, token, meter_id, start_date, end_date, store)
+
+    report_frame = None
+    if in_report:
+        report_frame = fetch_meter_frame(
+            engine, token, meter, start_date, end_date, store=store, readings_future=readings_future
+        )
+
+    fault_frame = None
+    if is_fault_candidate(meter.get("name")) and meters.matches(meter, FAULT_QUERY):
+        readings = (readings_future.result() or {}).get("readings") or []
+        if readings:
+            site_info = cached_site_info(engine, token, meter.get("siteId"))
+            fault_frame = readings_frame(meter_id, meter.get("name"), site_info.get("name", "Unknown"), readings)
+    return report_frame, fault_frame
+
+@run_summary("Combined report")
+def main(start_date=None, end_date=None, concurrency=None, rate_limit=None, incremental=INCREMENTAL_SYNC, fmt=REPORT_FORMAT, progress=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = last_month_window()
+    try:
+        token = get_token()
+        print("✅ Authenticated")
+    except Exception as e:
+        print(f"⚠️ Authentication failed: {e}")
+        return
+
+    print(f"Fetching data for {start_date} to {end_date}")
+    bar = tqdm(total=0, desc="Fetching meter data")
+
+    def more_meters(n):
+        bar.total += n
+        bar.refresh()
+        if progress:
+            progress.add_total(n)
+
+    # Both searches stream into the fetch; each meter is fetched once for both reports
+    meters = MeterQueryUnion(token, [METER_QUERY, FAULT_QUERY], on_more=more_meters)
+
+    store = ReadingsStore() if incremental else None
+    filename = report_filename(REPORT_OUTPUT_DIR, "latest_ceentiel_report", fmt)
+    writer = open_report_writer(filename, fmt)
+    fault_frames = []
+    skipped_meters = []
+    try:
+        with FetchEngine(concurrency=concurrency, rate_limit=rate_limit) as engine:
+            process = lambda meter: process_meter(engine, token, meter, meters, start_date, end_date, store)
+            for _, meter, (report_frame, fault_frame) in engine.map_meters(meters, process, ordered=True, failed=(None, None)):
+                bar.update()
+                if report_frame is not None:
+                    record_rows("report", len(report_frame))
+                    with stage("write_report"):
+                        writer.write(report_frame)
+                if fault_frame is not None:
+                    record_rows("faulty", len(fault_frame))
+                    fault_frames.append(fault_frame)
+                failed = report_frame is None and fault_frame is None
+                if failed:
+                    skipped_meters.append(meter.get("meterId"))
+                if progress:
+                    progress.meter_done(rows=0 if report_frame is None else len(report_frame), error=failed)
+    except BaseException:
+        # A partial report must not replace the last complete one
+        writer.abort()
+        raise
+    else:
+        rows = writer.close()
+    finally:
+        bar.close()
+        get_metadata_cache().save()
+        if store:
+            store.close()
+
+    print(f"✅ {meters.count} unique meters across both reports")
+    if rows:
+        print(f"✅ Saved {rows} rows to {filename}")
+    else:
+        print("⚠️ No valid readings collected, empty report generated")
+    uploads = [upload_report(filename, fmt)]
+
+    faulty = detect_anomalies(pd.concat(fault_frames, ignore_index=True) if fault_frames else None)
+    uploads.append(save_faulty_report(faulty))
+
+    if skipped_meters:
+        print(f"⚠️ Skipped meters due to errors: {skipped_meters}")
+    wait_for_uploads(uploads)
+
+def run(start_date=None, end_date=None, incremental=INCREMENTAL_SYNC, progress=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = last_month_window()
+    print(f"Running combined CDD and faulty meters report for {start_date} to {end_date}")
+    main(start_date, end_date, incremental=incremental, progress=progress)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the CDD report and the faulty meter report from one fetch pass")
+    parser.add_argument("--start", required=False, help="Start date (ISO); defaults to the last complete month")
+    parser.add_argument("--end", required=False, help="End date (ISO)")
+    parser.add_argument("--incremental", action="store_true", default=INCREMENTAL_SYNC, help="Only download readings newer than the local store")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=REPORT_FORMAT, help="Report file format")
+    args = parser.parse_args()
+    main(args.start, args.end, incremental=args.incremental, fmt=args.format)
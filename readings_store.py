@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from timestamps import reading_times
+from common import CACHE_DIR
+
+# Local copy of meter readings so incremental runs only download what is new
+STORE_PATH = os.getenv("READINGS_STORE_PATH", os.path.join(CACHE_DIR, "readings.sqlite"))
+
+
+def to_epoch_ms(value):
+    # Accepts API-style ISO strings ("...Z", "+00:00", date-only) or epoch milliseconds
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def to_iso(epoch_ms):
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+
+def merge_ranges(ranges):
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        elif lo < hi:
+            merged.append((lo, hi))
+    return merged
+
+def subtract_ranges(ranges, holes):
+    result = []
+    for lo, hi in merge_ranges(ranges):
+        for hole_lo, hole_hi in merge_ranges(holes):
+            if hole_hi <= lo or hole_lo >= hi:
+                continue
+            if hole_lo > lo:
+                result.append((lo, hole_lo))
+            lo = max(lo, hole_hi)
+        if lo < hi:
+            result.append((lo, hi))
+    return result
+
+
+class ReadingsStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS readings ("
+                "meter_id TEXT NOT NULL, ts INTEGER NOT NULL, payload TEXT NOT NULL, "
+                "PRIMARY KEY (meter_id, ts))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                "meter_id TEXT PRIMARY KEY, synced_from INTEGER NOT NULL, "
+                "high_water INTEGER, synced_at TEXT NOT NULL)"
+            )
+            # Downloaded [start_ms, end_ms) windows per meter, merged when they touch.
+            # Stores from before this table re-download each window once.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS synced_ranges ("
+                "meter_id TEXT NOT NULL, start_ms INTEGER NOT NULL, end_ms INTEGER NOT NULL, "
+                "PRIMARY KEY (meter_id, start_ms))"
+            )
+
+    def sync_state(self, meter_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_from, high_water FROM sync_state WHERE meter_id = ?", (str(meter_id),)
+            ).fetchone()
+        return row
+
+    def synced_ranges(self, meter_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start_ms, end_ms FROM synced_ranges WHERE meter_id = ? ORDER BY start_ms", (str(meter_id),)
+            ).fetchall()
+
+    def missing_ranges(self, meter_id, start_date, end_date):
+        # Parts of [start, end) not downloaded yet, as (start_ms, end_ms) pairs
+        start_ms, end_ms = to_epoch_ms(start_date), to_epoch_ms(end_date)
+        state = self.sync_state(meter_id)
+        high_water = state[1] if state else None
+        gaps = []
+        cursor = start_ms
+        for lo, hi in self.synced_ranges(meter_id):
+            if high_water is None or hi > high_water:
+                # Re-read from the last stored reading so a late-arriving final interval is picked up
+                hi = lo if high_water is None else max(lo, high_water)
+            if hi <= cursor:
+                continue
+            if lo >= end_ms:
+                break
+            if lo > cursor:
+                gaps.append((cursor, lo))
+            cursor = hi
+        if cursor < end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+
+    def save_readings(self, meter_id, readings, windows, failed_windows=()):
+        # windows: the (start_ms, end_ms) ranges this download asked for; parts in
+        # failed_windows are not marked as synced
+        meter_id = str(meter_id)
+        epoch_ms, undated = reading_times(readings)
+        rows = [
+            (meter_id, int(ts), json.dumps(reading))
+            for reading, ts, skip in zip(readings, epoch_ms, undated)
+            if not skip
+        ]
+        covered = subtract_ranges(windows, failed_windows)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO readings (meter_id, ts, payload) VALUES (?, ?, ?)", rows
+            )
+            if covered:
+                existing = self._conn.execute(
+                    "SELECT start_ms, end_ms FROM synced_ranges WHERE meter_id = ?", (meter_id,)
+                ).fetchall()
+                self._conn.execute("DELETE FROM synced_ranges WHERE meter_id = ?", (meter_id,))
+                self._conn.executemany(
+                    "INSERT INTO synced_ranges (meter_id, start_ms, end_ms) VALUES (?, ?, ?)",
+                    [(meter_id, lo, hi) for lo, hi in merge_ranges(existing + covered)],
+                )
+            high_water = self._conn.execute(
+                "SELECT MAX(ts) FROM readings WHERE meter_id = ?", (meter_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO sync_state (meter_id, synced_from, high_water, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(meter_id) DO UPDATE SET synced_from = MIN(synced_from, excluded.synced_from), "
+                "high_water = excluded.high_water, synced_at = excluded.synced_at",
+                (meter_id, min(lo for lo, _ in windows), high_water, datetime.now(timezone.utc).isoformat()),
+            )
+        return len(rows)
+
+    def load_readings(self, meter_id, start_date, end_date):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM readings WHERE meter_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (str(meter_id), to_epoch_ms(start_date), to_epoch_ms(end_date)),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,129 @@
+import glob
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from common import CACHE_DIR
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip is offered
+    brotli = None
+
+# Precompressed copies of served reports, regenerated whenever the report changes
+COMPRESSED_DIR = os.path.join(CACHE_DIR, "served")
+# Not worth compressing below this size
+MIN_COMPRESS_BYTES = 1024
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def file_version(stat_result):
+    return hashlib.sha1(f"{stat_result.st_mtime_ns}-{stat_result.st_size}".encode("utf-8")).hexdigest()[:16]
+
+def accepted_encodings(header):
+    # {token: q} from an Accept-Encoding header
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.strip().lower()] = q
+    return accepted
+
+def choose_encoding(header):
+    # Highest q wins; brotli before gzip on ties since it compresses CSV better
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def compressed_copy(path, version, encoding, compressed_dir=COMPRESSED_DIR):
+    name = os.path.basename(path)
+    target = os.path.join(compressed_dir, f"{name}.{version}{ENCODINGS[encoding]}")
+    if os.path.exists(target):
+        return target
+    with _locks_lock:
+        lock = _locks.setdefault(target, threading.Lock())
+    with lock:
+        if os.path.exists(target):
+            return target
+        os.makedirs(compressed_dir, exist_ok=True)
+        tmp_path = f"{target}.tmp"
+        if encoding == "gzip":
+            with open(path, "rb") as src, gzip.GzipFile(tmp_path, "wb", compresslevel=6, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            compressor = brotli.Compressor(quality=5)
+            with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                for block in iter(lambda: src.read(1024 * 1024), b""):
+                    dst.write(compressor.process(block))
+                dst.write(compressor.finish())
+        os.replace(tmp_path, target)
+        # Drop copies of older versions of this report
+        for stale in glob.glob(os.path.join(compressed_dir, f"{glob.escape(name)}.*{ENCODINGS[encoding]}")):
+            if stale != target:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+    with _locks_lock:
+        _locks.pop(target, None)
+    return target
+
+async def serve_report_file(request, path, media_type, filename):
+    # Conditional GET on a content version, precompressed gzip/br variants, and
+    # byte ranges (served from the uncompressed file by FileResponse)
+    stat_result = os.stat(path)
+    version = file_version(stat_result)
+    last_modified = stat_result.st_mtime
+    encoding = None
+    if "range" not in request.headers and stat_result.st_size >= MIN_COMPRESS_BYTES:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+    etag = f'"{version}-{encoding}"' if encoding else f'"{version}"'
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(last_modified, usegmt=True),
+        "cache-control": "no-cache",
+        "vary": "Accept-Encoding",
+    }
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        path = await run_in_threadpool(compressed_copy, path, version, encoding)
+        headers["content-encoding"] = encoding
+        # Byte ranges would apply to the compressed bytes; only offered uncompressed
+        headers["accept-ranges"] = "none"
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+import pandas as pd
+from timestamps import DISPLAY_FORMAT, parse_epoch_ms, format_ms
+from common import CACHE_DIR
+
+INDEX_DIR = os.path.join(CACHE_DIR, "report_index")
+READ_CHUNK_ROWS = 100_000
+DATE_FORMAT = DISPLAY_FORMAT
+
+# Which report columns the meter, site and date filters look at
+REPORT_FIELDS = {
+    "latest_ceentiel_report": {"meter": "meter_id", "site_id": "site_id", "site_name": "site_info.name", "date": "date"},
+    "faulty_meter_deltas": {"meter": "meter_id", "site_id": None, "site_name": "site_name", "date": "current_time"},
+}
+
+
+def normalise_dates(values):
+    # Offsets are dropped, as in the report itself: filters use the wall-clock time the API reported
+    epoch_ms, invalid = parse_epoch_ms(values, wall_clock=True)
+    return format_ms(epoch_ms, invalid, DATE_FORMAT, fallback="").set_axis(values.index)
+
+def query_bound(value):
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValueError(f"Unrecognised date: {value}")
+
+
+class ReportIndex:
+    # SQLite copy of a CSV report with indexed meter, site and date columns. Rebuilt
+    # (into a new file, swapped in atomically) whenever the report file changes.
+    def __init__(self, source, fields, index_dir=INDEX_DIR):
+        self.source = source
+        self.fields = fields
+        self.path = os.path.join(index_dir, os.path.basename(source) + ".sqlite")
+        self._version = None
+        self._columns = []
+        self._lock = threading.Lock()
+
+    def _source_version(self):
+        st = os.stat(self.source)
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def ensure(self):
+        version = self._source_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            if self._stored_version() != version:
+                self._build(version)
+            with closing(sqlite3.connect(self.path)) as con:
+                self._columns = [row[1] for row in con.execute("PRAGMA table_info(rows)") if not row[1].startswith("_")]
+            self._version = version
+
+    def _stored_version(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with closing(sqlite3.connect(self.path)) as con:
+                row = con.execute("SELECT value FROM meta WHERE key = 'source_version'").fetchone()
+            return row[0] if row else None
+        except sqlite3.Error:
+            return None
+
+    def _build(self, version):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        con = sqlite3.connect(tmp_path)
+        try:
+            con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            rows = 0
+            for chunk in self._read_chunks():
+                meter = self.fields["meter"]
+                site_id, site_name = self.fields["site_id"], self.fields["site_name"]
+                chunk["_meter_id"] = chunk[meter] if meter in chunk else ""
+                chunk["_site_id"] = chunk[site_id] if site_id in chunk else ""
+                chunk["_site_name"] = chunk[site_name] if site_name in chunk else ""
+                chunk["_date"] = normalise_dates(chunk[self.fields["date"]]) if self.fields["date"] in chunk else ""
+                chunk.to_sql("rows", con, if_exists="append", index=False)
+                rows += len(chunk)
+            if rows == 0:
+                con.execute("CREATE TABLE IF NOT EXISTS rows (_meter_id TEXT, _site_id TEXT, _site_name TEXT, _date TEXT)")
+            for column in ("_meter_id", "_site_id", "_site_name"):
+                con.execute(f"CREATE INDEX idx{column} ON rows ({column}, _date)")
+            con.execute("CREATE INDEX idx_date ON rows (_date)")
+            con.execute("INSERT INTO meta VALUES ('source_version', ?)", (version,))
+            con.commit()
+        finally:
+            con.close()
+        os.replace(tmp_path, self.path)
+        print(f"🗂️ Indexed {rows} rows of {self.source}")
+
+    def _read_chunks(self):
+        # Everything stays text, so query results match the CSV byte for byte
+        try:
+            yield from pd.read_csv(self.source, dtype=str, keep_default_na=False, chunksize=READ_CHUNK_ROWS)
+        except pd.errors.EmptyDataError:
+            return
+
+    def query(self, meter_ids=None, site=None, start=None, end=None, limit=None, offset=0):
+        # start is inclusive, end exclusive; both compare against the normalised row time
+        self.ensure()
+        clauses, params = [], []
+        if meter_ids:
+            clauses.append(f"_meter_id IN ({', '.join('?' * len(meter_ids))})")
+            params.extend(str(m) for m in meter_ids)
+        if site:
+            clauses.append("(_site_id = ? OR _site_name = ?)")
+            params.extend([str(site), str(site)])
+        start, end = query_bound(start), query_bound(end)
+        if start:
+            clauses.append("_date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("_date < ?")
+            params.append(end)
+        if not self._columns:
+            return pd.DataFrame()
+        columns = ", ".join(f'"{c}"' for c in self._columns)
+        sql = f"SELECT {columns} FROM rows"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # SQLite only takes OFFSET after a LIMIT; -1 means no limit
+        sql += " ORDER BY rowid LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else int(limit), int(offset or 0)])
+        with closing(sqlite3.connect(self.path)) as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_report_index(name, source):
+    with _indexes_lock:
+        index = _indexes.get(source)
+        if index is None:
+            index = _indexes[source] = ReportIndex(source, REPORT_FIELDS[name])
+        return index
@@ -0,0 +1,252 @@
+import csv
+import os
+import shutil
+import threading
+import uuid
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process lock; writers in one process still take turns
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Output format for the readings report: "csv" or "parquet" (needs pyarrow)
+REPORT_FORMAT = os.getenv("REPORT_FORMAT", "csv").lower()
+# Where finished reports are written (and served from by the API)
+REPORT_OUTPUT_DIR = os.getenv("REPORT_OUTPUT_DIR", "public")
+
+_output_locks = {}
+_output_locks_lock = threading.Lock()
+
+
+class _OutputLock:
+    def __init__(self, lock, fd):
+        self._lock = lock
+        self._fd = fd
+
+    def release(self):
+        try:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self._lock.release()
+
+def _lock_file(path):
+    # Held across processes too (CLI next to the API, several API workers)
+    if fcntl is None:
+        return None
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, f".{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"⏳ Another process is writing {path}, waiting for it to finish")
+            fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+def _lock_output(path):
+    # One writer per report file (the CDD and combined reports share one); a second
+    # run waits here, before it starts fetching
+    path = os.path.abspath(path)
+    with _output_locks_lock:
+        lock = _output_locks.setdefault(path, threading.Lock())
+    if not lock.acquire(blocking=False):
+        print(f"⏳ Another run is writing {path}, waiting for it to finish")
+        lock.acquire()
+    try:
+        return _OutputLock(lock, _lock_file(path))
+    except BaseException:
+        lock.release()
+        raise
+
+def _temp_name(path):
+    # Unique per writer, so runs in other processes never share a temp file
+    return f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class CsvReportWriter:
+    # Appends each chunk to a temp file as it arrives and moves it into place on close.
+    # Columns first seen in a later chunk are appended to the schema; earlier rows are
+    # padded in one streaming pass at close, so memory stays at one chunk.
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{_temp_name(path)}.part"
+        self.columns = None
+        self.rows = 0
+        self._grown = False
+        self._output_lock = _lock_output(path)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(self.tmp_path, "w", newline="", encoding="utf-8")
+        except BaseException:
+            self._output_lock.release()
+            raise
+
+    def write(self, frame):
+        if frame is None or frame.empty:
+            return
+        header = self.columns is None
+        if header:
+            self.columns = list(frame.columns)
+        else:
+            new_columns = [c for c in frame.columns if c not in self.columns]
+            if new_columns:
+                self.columns.extend(new_columns)
+                self._grown = True
+        frame.reindex(columns=self.columns).to_csv(self._file, header=header, index=False)
+        self._file.flush()
+        self.rows += len(frame)
+
+    def close(self):
+        try:
+            self._file.close()
+            if self.columns is None:
+                pd.DataFrame().to_csv(self.tmp_path, index=False)
+            elif self._grown:
+                self._pad_rows()
+            os.replace(self.tmp_path, self.path)
+            return self.rows
+        finally:
+            self._output_lock.release()
+
+    def abort(self):
+        # Drops the partial output; the previous report at `path` stays as it was
+        try:
+            self._file.close()
+            for path in (self.tmp_path, f"{self.tmp_path}.pad"):
+                if os.path.exists(path):
+                    os.remove(path)
+        finally:
+            self._output_lock.release()
+
+    def _pad_rows(self):
+        width = len(self.columns)
+        padded_path = f"{self.tmp_path}.pad"
+        with open(self.tmp_path, newline="", encoding="utf-8") as src, \
+                open(padded_path, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            next(reader, None)
+            writer.writerow(self.columns)
+            for row in reader:
+                writer.writerow(row + [""] * (width - len(row)))
+        os.replace(padded_path, self.tmp_path)
+
+
+def _to_arrow(frame):
+    # Categoricals are decoded and nested metadata stringified, matching the CSV text
+    arrays = {}
+    for col in frame.columns:
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if series.dtype == object:
+            series = series.map(lambda v: str(v) if isinstance(v, (list, dict)) else v)
+        try:
+            arrays[col] = pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays[col] = pa.array(series.map(lambda v: None if v is None else str(v)), type=pa.string())
+    return pa.table(arrays)
+
+def _merge_type(types):
+    types = {t for t in types if not pa.types.is_null(t)}
+    if not types:
+        return pa.null()
+    if len(types) == 1:
+        return types.pop()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+class ParquetReportWriter:
+    # Each chunk lands in its own part file; close() unifies the schemas and streams
+    # the parts into a single compressed Parquet file, one row group per chunk.
+    def __init__(self, path, compression="zstd"):
+        if pa is None:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        temp_name = _temp_name(path)
+        self.parts_dir = f"{temp_name}.parts"
+        self.tmp_path = f"{temp_name}.part"
+        self.compression = compression
+        self.rows = 0
+        self._parts = []
+        self._output_lock = _lock_output(path)
+        try:
+            os.makedirs(self.parts_dir, exist_ok=True)
+        except BaseException:
+            self._output_lock.release()
+            raise
+
+    def write(self, frame):
+        if frame is None or frame.empty:
+            return
+        part_path = os.path.join(self.parts_dir, f"part-{len(self._parts):05d}.parquet")
+        pq.write_table(_to_arrow(frame), part_path, compression=self.compression)
+        self._parts.append(part_path)
+        self.rows += len(frame)
+
+    def close(self):
+        try:
+            return self._close()
+        except BaseException:
+            self._discard()
+            raise
+        finally:
+            self._output_lock.release()
+
+    def _close(self):
+        columns = {}
+        for part in self._parts:
+            for field in pq.read_schema(part):
+                columns.setdefault(field.name, []).append(field.type)
+        schema = pa.schema([(name, _merge_type(types)) for name, types in columns.items()])
+        with pq.ParquetWriter(self.tmp_path, schema, compression=self.compression) as writer:
+            for part in self._parts:
+                table = pq.read_table(part)
+                arrays = []
+                for field in schema:
+                    if field.name in table.column_names:
+                        arrays.append(table[field.name].cast(field.type))
+                    else:
+                        arrays.append(pa.nulls(len(table), type=field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        os.replace(self.tmp_path, self.path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.rows
+
+    def abort(self):
+        try:
+            self._discard()
+        finally:
+            self._output_lock.release()
+
+    def _discard(self):
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def report_filename(output_dir, name, fmt=REPORT_FORMAT):
+    return os.path.join(output_dir, f"{name}.{'parquet' if fmt == 'parquet' else 'csv'}")
+
+def open_report_writer(path, fmt=REPORT_FORMAT):
+    if fmt == "parquet":
+        return ParquetReportWriter(path)
+    return CsvReportWriter(path)
@@ -0,0 +1,303 @@
+import json
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from common import CACHE_DIR, save_json
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process lock; the job manager still stops overlaps in-process
+    fcntl = None
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TZ = ZoneInfo(os.getenv("SCHEDULER_TZ", "Asia/Dubai"))
+# Each run starts up to this many seconds late, so instances don't hit the API together
+SCHEDULER_JITTER_SECS = float(os.getenv("SCHEDULER_JITTER_SECS", "300"))
+# Missed runs older than the latest this many are not caught up
+MAX_CATCH_UP = int(os.getenv("SCHEDULER_MAX_CATCH_UP", "3"))
+STATE_FILE = os.path.join(CACHE_DIR, "scheduler_state.json")
+
+# report: key into the runners passed to Scheduler; window: see rolling_window
+DEFAULT_SCHEDULES = [
+    {"name": "monthly-report", "report": "report", "cron": "0 2 1 * *", "window": "last_month", "options": {"incremental": True}},
+    {"name": "daily-faulty-report", "report": "faulty-report", "cron": "30 3 * * *", "window": "last_day"},
+]
+
+
+def _parse_field(field, lo, hi):
+    values = set()
+    for part in field.split(","):
+        expr, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if expr == "*":
+            start, end = lo, hi
+        elif "-" in expr:
+            start, end = (int(v) for v in expr.split("-", 1))
+        else:
+            start = end = int(expr)
+            if step > 1:
+                end = hi
+        if not (lo <= start <= end <= hi) or step < 1:
+            raise ValueError(f"Cron field {field!r} out of range {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    # Standard five fields: minute hour day-of-month month day-of-week (0 or 7 = Sunday)
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes = sorted(_parse_field(fields[0], 0, 59))
+        self.hours = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}
+        # As in cron: if both day fields are restricted, either one matching is enough
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day):
+        dom = day.day in self.days
+        dow = (day.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, after):
+        # First fire time strictly after `after` (timezone-aware)
+        day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(366 * 5):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        fire = day.replace(hour=hour, minute=minute)
+                        if fire > after:
+                            return fire
+            day = (day + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"Cron expression never fires: {self.expr!r}")
+
+    def fires_between(self, start, end):
+        # Fire times in (start, end]
+        fires = []
+        fire = self.next_after(start)
+        while fire <= end:
+            fires.append(fire)
+            fire = self.next_after(fire)
+        return fires
+
+
+def rolling_window(window, at):
+    # [start, end) of the complete period before `at`, as ISO strings with offset
+    at = at.replace(second=0, microsecond=0)
+    if window == "last_hour":
+        end = at.replace(minute=0)
+        start = end - timedelta(hours=1)
+    elif window == "last_day":
+        end = at.replace(hour=0, minute=0)
+        start = end - timedelta(days=1)
+    elif window == "last_week":
+        end = at.replace(hour=0, minute=0) - timedelta(days=at.weekday())
+        start = end - timedelta(days=7)
+    elif window == "last_month":
+        end = at.replace(day=1, hour=0, minute=0)
+        start = (end - timedelta(days=1)).replace(day=1)
+    else:
+        raise ValueError(f"Unknown window: {window}")
+    return start.isoformat(timespec="milliseconds"), end.isoformat(timespec="milliseconds")
+
+def last_month_window(tz=SCHEDULER_TZ):
+    return rolling_window("last_month", datetime.now(tz))
+
+def previous_window(start_date, end_date):
+    # The period just before [start_date, end_date): whole calendar months step back by
+    # months, anything else by the same length of time
+    start, end = datetime.fromisoformat(start_date), datetime.fromisoformat(end_date)
+    if start.day == end.day == 1 and start.time() == end.time() == datetime.min.time():
+        months = (end.year - start.year) * 12 + end.month - start.month
+        index = start.year * 12 + start.month - 1 - months
+        prev = start.replace(year=index // 12, month=index % 12 + 1)
+    else:
+        prev = start - (end - start)
+    return prev.isoformat(timespec="milliseconds"), start.isoformat(timespec="milliseconds")
+
+
+class Schedule:
+    def __init__(self, name, report, cron, window, options=None):
+        self.name = name
+        self.report = report
+        self.cron = CronSchedule(cron)
+        self.window = window
+        self.options = options or {}
+        rolling_window(window, datetime.now(SCHEDULER_TZ))
+
+    def as_dict(self):
+        return {"name": self.name, "report": self.report, "cron": self.cron.expr, "window": self.window, "options": self.options}
+
+
+def load_schedules():
+    # REPORT_SCHEDULES: JSON list shaped like DEFAULT_SCHEDULES
+    raw = os.getenv("REPORT_SCHEDULES")
+    config = json.loads(raw) if raw else DEFAULT_SCHEDULES
+    return [Schedule(**entry) for entry in config]
+
+
+class _SingleFlight:
+    # Non-blocking cross-process lock, so several API processes run a schedule once
+    def __init__(self, path):
+        self.path = path if fcntl else None
+        self._fd = None
+
+    def __enter__(self):
+        if self.path is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class Scheduler:
+    # Fires report runs on cron schedules through the job manager. A run after missed
+    # fires (up to MAX_CATCH_UP) covers one window from the start of the oldest missed
+    # window to the end of the newest, since every run rewrites the same report file.
+    def __init__(self, schedules, runners, job_manager, state_path=STATE_FILE, tz=SCHEDULER_TZ, jitter=SCHEDULER_JITTER_SECS, max_catch_up=MAX_CATCH_UP):
+        self.schedules = schedules
+        self.runners = runners
+        self.job_manager = job_manager
+        self.state_path = state_path
+        self.tz = tz
+        self.jitter = jitter
+        self.max_catch_up = max_catch_up
+        self._state = self._load()
+        self._next = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable scheduler state {self.state_path}: {e}")
+            return {}
+
+    def _save(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            data = dict(self._state)
+        save_json(self.state_path, data, indent=2)
+
+    def _handled_until(self, schedule, now):
+        with self._lock:
+            last = self._state.get(schedule.name, {}).get("handled_until")
+            if last is None:
+                # First start: nothing to catch up on
+                self._state.setdefault(schedule.name, {})["handled_until"] = now.isoformat()
+                return now
+        return datetime.fromisoformat(last).astimezone(self.tz)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="scheduler")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _plan(self, schedule, after):
+        fire = schedule.cron.next_after(after)
+        due = fire.timestamp() + random.uniform(0, self.jitter)
+        with self._lock:
+            self._next[schedule.name] = (fire, due)
+
+    def _loop(self):
+        if not self.schedules:
+            return
+        now = datetime.now(self.tz)
+        for schedule in self.schedules:
+            last = self._handled_until(schedule, now)
+            if schedule.cron.fires_between(last, now):
+                print(f"⏰ {schedule.name}: catching up on missed runs")
+                try:
+                    self.trigger(schedule, now)
+                except Exception:
+                    traceback.print_exc()
+            self._plan(schedule, now)
+        self._save()
+        while not self._stop.is_set():
+            with self._lock:
+                name, (fire, due) = min(self._next.items(), key=lambda item: item[1][1])
+            wait = due - time.time()
+            if wait > 0:
+                # Wake at least once a minute so clock jumps are noticed
+                self._stop.wait(min(wait, 60))
+                continue
+            schedule = next(s for s in self.schedules if s.name == name)
+            try:
+                self.trigger(schedule, fire)
+            except Exception:
+                traceback.print_exc()
+            self._plan(schedule, fire)
+
+    def trigger(self, schedule, fire):
+        # Returns (job, created); joins the report's active job if one is running
+        fires = schedule.cron.fires_between(self._handled_until(schedule, fire), fire) or [fire]
+        windows = [rolling_window(schedule.window, f) for f in fires[-self.max_catch_up:]]
+        # Fires are in time order, so the first window starts earliest and the last ends latest
+        start, end = windows[0][0], windows[-1][1]
+        runner = self.runners[schedule.report]
+        lock_path = os.path.join(CACHE_DIR, f"scheduler-{schedule.name}.lock")
+
+        def run_window(progress):
+            with _SingleFlight(lock_path) as acquired:
+                if not acquired:
+                    print(f"⏭️ {schedule.name} is already running in another process, skipping")
+                    return
+                missed = f" ({len(windows)} missed runs)" if len(windows) > 1 else ""
+                print(f"⏰ {schedule.name}: {start} to {end}{missed}")
+                runner(start_date=start, end_date=end, progress=progress, **schedule.options)
+                with self._lock:
+                    self._state.setdefault(schedule.name, {})["handled_until"] = fire.isoformat()
+                self._save()
+
+        job, created = self.job_manager.submit(schedule.report, run_window)
+        if not created:
+            print(f"⏭️ {schedule.name}: {schedule.report} already running, not stacking another run")
+        return job, created
+
+    def as_list(self):
+        with self._lock:
+            planned = dict(self._next)
+            state = {name: dict(entry) for name, entry in self._state.items()}
+        return [
+            {
+                **s.as_dict(),
+                "next_fire": planned[s.name][0].isoformat() if s.name in planned else None,
+                "next_start": datetime.fromtimestamp(planned[s.name][1], self.tz).isoformat() if s.name in planned else None,
+                "handled_until": state.get(s.name, {}).get("handled_until"),
+            }
+            for s in self.schedules
+        ]
@@ -0,0 +1,137 @@
+import os
+import threading
+import numpy as np
+from readings_store import to_epoch_ms, to_iso
+from timestamps import reading_times
+
+HOUR_MS = 3600 * 1000
+# Windows up to this long start as one request; only longer ones are pre-split. Shards
+# shrink below it only after timeouts, server errors or slow requests (see ShardSizer).
+SHARD_DAYS = float(os.getenv("READINGS_SHARD_DAYS", "35"))
+MIN_SHARD_HOURS = float(os.getenv("READINGS_MIN_SHARD_HOURS", "6"))
+# A shard slower than this shrinks the shard size for the rest of the run
+SLOW_SHARD_SECS = float(os.getenv("READINGS_SLOW_SHARD_SECS", "20"))
+# Failed shards re-split per meter before the remaining windows are given up
+MAX_SHARD_SPLITS = int(os.getenv("READINGS_MAX_SHARD_SPLITS", "8"))
+
+
+class ShardResponse:
+    # What a shard fetch returns: the API response dict ({} on failure), the seconds the
+    # server took (None if unknown) and whether a failure may pass on a smaller window
+    def __init__(self, data, seconds, transient=False):
+        self.data = data
+        self.seconds = seconds
+        self.transient = transient
+
+    @property
+    def ok(self):
+        return bool(self.data) and "readings" in self.data
+
+
+class ShardSizer:
+    # Shared across meters: shrinks on slow shards, timeouts and server errors, grows back
+    # slowly on fast ones. Client errors say nothing about the window size and are ignored.
+    def __init__(self, max_ms=SHARD_DAYS * 24 * HOUR_MS, min_ms=MIN_SHARD_HOURS * HOUR_MS, slow_secs=SLOW_SHARD_SECS):
+        self.max_ms = max_ms
+        self.min_ms = max(HOUR_MS, min(min_ms, max_ms))
+        self.slow_secs = slow_secs
+        self.size_ms = max_ms
+        self._lock = threading.Lock()
+
+    def current(self):
+        # Whole hours keep shard boundaries readable in logs and API calls
+        return max(HOUR_MS, self.size_ms // HOUR_MS * HOUR_MS)
+
+    def observe(self, elapsed, ok):
+        with self._lock:
+            if not ok or elapsed > self.slow_secs:
+                self.size_ms = max(self.min_ms, self.size_ms / 2)
+            elif elapsed < self.slow_secs / 4:
+                self.size_ms = min(self.max_ms, self.size_ms * 1.25)
+
+
+shard_sizer = ShardSizer()
+
+
+def shard_windows(start_ms, end_ms, size_ms):
+    windows = []
+    cursor = start_ms
+    while cursor < end_ms:
+        windows.append((cursor, min(end_ms, cursor + int(size_ms))))
+        cursor = windows[-1][1]
+    return windows
+
+def merge_readings(chunks):
+    # Later shards win on duplicate timestamps; undated readings are kept as-is
+    readings = [reading for chunk in chunks for reading in chunk]
+    epoch_ms, undated = reading_times(readings)
+    dated = np.flatnonzero(~undated)
+    # First hit in the reversed order is the last occurrence; unique also sorts by ts
+    _, last = np.unique(epoch_ms[dated][::-1], return_index=True)
+    keep = dated[len(dated) - 1 - last]
+    return [readings[i] for i in keep] + [readings[i] for i in np.flatnonzero(undated)]
+
+
+class ShardedFetch:
+    # fetch(start_iso, end_iso) returns a ShardResponse. Shards are submitted on
+    # construction; result() gathers them and re-splits a shard that failed transiently
+    # in halves down to the minimum size. Any other failure gives up on the meter's
+    # remaining splits at once.
+    def __init__(self, engine, host, fetch, start_date, end_date, sizer=shard_sizer, max_splits=MAX_SHARD_SPLITS):
+        self.engine = engine
+        self.host = host
+        self.fetch = fetch
+        self.sizer = sizer
+        self.start_ms = to_epoch_ms(start_date)
+        self.end_ms = to_epoch_ms(end_date)
+        self.failed_windows = []
+        self._splits_left = max_splits
+        if self.end_ms - self.start_ms <= sizer.current():
+            # Small enough for one request: keep the caller's original date strings
+            self._pending = [((self.start_ms, self.end_ms), self._submit(start_date, end_date))]
+        else:
+            windows = shard_windows(self.start_ms, self.end_ms, sizer.current())
+            self._pending = [(w, self._submit(to_iso(w[0]), to_iso(w[1]))) for w in windows]
+
+    def _observed_fetch(self, start, end):
+        resp = self.fetch(start, end)
+        if resp.ok and resp.seconds is not None:
+            self.sizer.observe(resp.seconds, True)
+        elif not resp.ok and resp.transient:
+            self.sizer.observe(resp.seconds or 0, False)
+        return resp
+
+    def _submit(self, start, end):
+        return self.engine.submit(self.host, self._observed_fetch, start, end)
+
+    def result(self):
+        # Returns the merged readings, or None if every shard failed
+        chunks = []
+        pending = self._pending
+        while pending:
+            retry = []
+            for (lo, hi), future in pending:
+                try:
+                    resp = future.result()
+                except Exception as e:
+                    print(f"⚠️ Readings shard {to_iso(lo)} - {to_iso(hi)} raised: {e}")
+                    resp = ShardResponse({}, None)
+                if resp.ok:
+                    chunks.append(resp.data["readings"])
+                    continue
+                if not resp.transient:
+                    # e.g. 404 or 403: a smaller window would fail the same way
+                    self._splits_left = 0
+                if hi - lo > self.sizer.min_ms and self._splits_left > 0:
+                    self._splits_left -= 1
+                    mid = lo + max(HOUR_MS, (hi - lo) // 2 // HOUR_MS * HOUR_MS)
+                    retry.append(((lo, mid), self._submit(to_iso(lo), to_iso(mid))))
+                    retry.append(((mid, hi), self._submit(to_iso(mid), to_iso(hi))))
+                else:
+                    self.failed_windows.append((lo, hi))
+            pending = retry
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0]
+        return merge_readings(chunks)
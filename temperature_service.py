@@ -0,0 +1,60 @@
+import os
+import threading
+import pandas as pd
+from timestamps import parse_epoch_ms, format_ms
+from common import InflightCalls, process_singleton
+
+# Cooling degree days are measured against this base temperature (°C)
+CDD_BASE_TEMP = float(os.getenv("CDD_BASE_TEMP", "18"))
+
+
+def daily_degree_days(readings, base=CDD_BASE_TEMP):
+    # Collapse a raw temperature series into one row per UTC day: mean temperature and CDD
+    df = pd.DataFrame.from_records(readings or [], columns=["time", "value"])
+    epoch_ms, invalid = parse_epoch_ms(df["time"])
+    values = pd.to_numeric(df["value"], errors="coerce")
+    valid = values.notna().to_numpy() & ~invalid
+    days = format_ms(epoch_ms[valid], invalid[valid], "%Y-%m-%d")
+    mdt = values[valid].groupby(days.values).mean()
+    table = pd.DataFrame({"mdt": mdt, "cdd": (mdt - base).clip(lower=0)})
+    table.index.name = "date"
+    return table
+
+
+class TemperatureService:
+    # Each (import_code, date range) is fetched once per process, however many meters share it
+    def __init__(self, base=CDD_BASE_TEMP):
+        self.base = base
+        self._tables = {}
+        self._inflight = InflightCalls()
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def daily_table(self, import_code, start_date, end_date, fetch):
+        key = (import_code, start_date, end_date)
+        with self._lock:
+            table = self._tables.get(key)
+        if table is not None:
+            return table
+        return self._inflight.call(key, lambda: self._fetch_table(key, fetch))
+
+    def _fetch_table(self, key, fetch):
+        with self._lock:
+            # Another caller's fetch may have finished since daily_table looked
+            table = self._tables.get(key)
+            if table is not None:
+                return table
+            self.fetches += 1
+        table = daily_degree_days(fetch(), self.base)
+        # Failed fetches come back empty; leave them uncached so a later pass can retry
+        if not table.empty:
+            with self._lock:
+                self._tables[key] = table
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+get_temperature_service = process_singleton(TemperatureService)
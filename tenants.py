@@ -0,0 +1,196 @@
+import importlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# One entry per customer tenant; see load_tenants for the fields
+TENANTS_FILE = os.getenv("TENANTS_FILE", "tenants.json")
+TENANT_WORKERS = int(os.getenv("TENANT_WORKERS", "4"))
+TENANTS_DIR = os.getenv("TENANTS_DIR", "tenants")
+
+# Same report names as the API's job and schedule keys
+REPORT_MODULES = {
+    "report": "automation",
+    "faulty-report": "detect_faulty_metres",
+    "combined-report": "pipeline",
+}
+
+
+# A value that is exactly "$NAME" or "${NAME}" is read from the environment
+_ENV_REF = re.compile(r"\$(?:\{(\w+)\}|(\w+))")
+
+
+def _expand(value, field):
+    # "$ACME_CLIENT_SECRET" or {"env": "ACME_CLIENT_SECRET"} keeps secrets out of the
+    # config file; any other value is taken literally, "$" and all
+    match = _ENV_REF.fullmatch(value) if isinstance(value, str) else None
+    if isinstance(value, dict) and set(value) == {"env"}:
+        var = value["env"]
+    elif match:
+        var = match.group(1) or match.group(2)
+    else:
+        return value
+    if not os.environ.get(var):
+        raise ValueError(f"{field} names an unset variable: {var}")
+    return os.environ[var]
+
+
+class Tenant:
+    def __init__(self, name, client_id, client_secret, faulty_client_id=None, faulty_client_secret=None,
+                 meter_query=None, fault_query=None, problem_codes=None, drive_folder_id=None,
+                 drive_upload=True, output_dir=None, cache_dir=None, concurrency=None, rate_limit=None, env=None):
+        if not name or name in (".", "..") or os.path.basename(name) != name:
+            raise ValueError(f"Invalid tenant name: {name!r}")
+        self.name = name
+        self.client_id = _expand(client_id, f"Tenant {name}: client_id")
+        self.client_secret = _expand(client_secret, f"Tenant {name}: client_secret")
+        # Workers inherit this process's environment, so a missing credential would
+        # silently fall back to the default tenant's
+        for field, value in (("client_id", self.client_id), ("client_secret", self.client_secret)):
+            if not value:
+                raise ValueError(f"Tenant {name}: {field} is missing")
+        self.faulty_client_id = _expand(faulty_client_id, f"Tenant {name}: faulty_client_id") or self.client_id
+        self.faulty_client_secret = _expand(faulty_client_secret, f"Tenant {name}: faulty_client_secret") or self.client_secret
+        self.meter_query = meter_query
+        self.fault_query = fault_query
+        self.problem_codes = problem_codes
+        self.drive_folder_id = drive_folder_id
+        self.drive_upload = drive_upload
+        self.output_dir = output_dir or os.path.join(TENANTS_DIR, name, "public")
+        # Tokens, metadata, readings store, checkpoints and upload state stay per tenant
+        self.cache_dir = cache_dir or os.path.join(TENANTS_DIR, name, "cache")
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.env = {k: str(_expand(v, f"Tenant {name}: env {k}")) for k, v in (env or {}).items()}
+
+    def environ(self):
+        # Settings for the tenant's worker process, applied before any report module is imported
+        env = {
+            "CLIENT_ID": self.client_id,
+            "CLIENT_SECRET": self.client_secret,
+            "FAULTY_CLIENT_ID": self.faulty_client_id,
+            "FAULTY_CLIENT_SECRET": self.faulty_client_secret,
+            "REPORT_OUTPUT_DIR": self.output_dir,
+            "C3NTINEL_CACHE_DIR": self.cache_dir,
+            "READINGS_STORE_PATH": os.path.join(self.cache_dir, "readings.sqlite"),
+            "RUNS_DIR": os.path.join(self.cache_dir, "runs"),
+            "DRIVE_UPLOAD": "1" if self.drive_upload else "0",
+        }
+        optional = {
+            "METER_QUERY": self.meter_query,
+            "FAULT_METER_QUERY": self.fault_query,
+            "PROBLEM_CODES": ",".join(self.problem_codes) if self.problem_codes is not None else None,
+            "DRIVE_FOLDER_ID": self.drive_folder_id,
+            "C3NTINEL_CONCURRENCY": self.concurrency,
+            "C3NTINEL_RATE_LIMIT": self.rate_limit,
+        }
+        env.update({k: str(v) for k, v in optional.items() if v is not None})
+        env.update(self.env)
+        return {k: v for k, v in env.items() if v is not None}
+
+
+def load_tenants(path=TENANTS_FILE):
+    # JSON list of objects with the Tenant arguments, e.g.
+    # {"name": "acme", "client_id": "$ACME_CLIENT_ID", "client_secret": {"env": "ACME_CLIENT_SECRET"},
+    #  "meter_query": "is:cumulative", "problem_codes": ["..."], "drive_folder_id": "..."}
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    tenants = [Tenant(**entry) for entry in config]
+    names = [t.name for t in tenants]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate tenant names in {path}: {sorted(duplicates)}")
+    return tenants
+
+
+def _run_tenant(name, env, report, start_date, end_date, options):
+    # Runs in a fresh spawned process per tenant, so the module-level settings, the
+    # token manager, rate limiter, caches and metrics all belong to this tenant alone
+    started = time.time()
+    os.environ.update(env)
+    output_dir = env["REPORT_OUTPUT_DIR"]
+    os.makedirs(output_dir, exist_ok=True)
+    log_path = os.path.join(output_dir, f"{report}.log")
+    with open(log_path, "a", encoding="utf-8") as log:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            module = importlib.import_module(REPORT_MODULES[report])
+            module.run(start_date=start_date, end_date=end_date, **options)
+            error = None
+        except BaseException as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+    return {
+        "tenant": name,
+        "report": report,
+        "ok": error is None,
+        "error": error,
+        "seconds": round(time.time() - started, 1),
+        "output_dir": output_dir,
+        "log": log_path,
+    }
+
+
+def run_tenants(tenants, report="combined-report", start_date=None, end_date=None, workers=TENANT_WORKERS, **options):
+    # Runs one report for every tenant in parallel; returns a result dict per tenant
+    if report not in REPORT_MODULES:
+        raise ValueError(f"Unknown report: {report}")
+    if not tenants:
+        return []
+    # spawn + one task per process: every tenant starts from a clean interpreter
+    # (needs Python 3.11+ for max_tasks_per_child)
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tenants))), mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1) as pool:
+        futures = [
+            pool.submit(_run_tenant, t.name, t.environ(), report, start_date, end_date, options)
+            for t in tenants
+        ]
+        print(f"🏢 Running {report} for {len(tenants)} tenants")
+        for tenant, future in zip(tenants, futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed); its log may say why
+                outcome = {"tenant": tenant.name, "report": report, "ok": False, "error": f"{type(e).__name__}: {e}",
+                           "seconds": None, "output_dir": tenant.output_dir, "log": os.path.join(tenant.output_dir, f"{report}.log")}
+            if outcome["ok"]:
+                print(f"✅ {tenant.name}: {report} finished in {outcome['seconds']}s, outputs in {outcome['output_dir']}")
+            else:
+                print(f"❌ {tenant.name}: {report} failed ({outcome['error']}), see {outcome['log']}")
+            results.append(outcome)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a report for several C3ntinel tenants in parallel")
+    parser.add_argument("--config", default=TENANTS_FILE, help="Tenant config (JSON list)")
+    parser.add_argument("--report", choices=sorted(REPORT_MODULES), default="combined-report")
+    parser.add_argument("--tenants", nargs="+", help="Only these tenants (default: all)")
+    parser.add_argument("--start", required=False, help="Start date (ISO); defaults to the last complete month")
+    parser.add_argument("--end", required=False, help="End date (ISO)")
+    parser.add_argument("--workers", type=int, default=TENANT_WORKERS, help="Tenants run at the same time")
+    parser.add_argument("--incremental", action="store_true", help="Only download readings newer than each tenant's store")
+    args = parser.parse_args()
+    tenants = load_tenants(args.config)
+    if args.tenants:
+        unknown = set(args.tenants) - {t.name for t in tenants}
+        if unknown:
+            parser.error(f"Unknown tenants: {sorted(unknown)}")
+        tenants = [t for t in tenants if t.name in args.tenants]
+    options = {"incremental": True} if args.incremental else {}
+    if options and args.report == "faulty-report":
+        parser.error("--incremental applies to report and combined-report only")
+    results = run_tenants(tenants, args.report, args.start, args.end, workers=args.workers, **options)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from readings_store import ReadingsStore, merge_ranges, subtract_ranges, to_epoch_ms
+
+
+def ms(text):
+    return to_epoch_ms(text)
+
+def hourly(start, end):
+    # One reading per hour in [start, end)
+    t = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    stop = datetime.fromisoformat(end).replace(tzinfo=timezone.utc)
+    readings = []
+    while t < stop:
+        readings.append({"date": t.isoformat(), "value": 1})
+        t += timedelta(hours=1)
+    return readings
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReadingsStore(str(tmp_path / "readings.sqlite"))
+    yield store
+    store.close()
+
+def sync(store, start, end, failed=()):
+    store.save_readings("m1", hourly(start, end), [(ms(start), ms(end))], failed)
+
+
+def test_merge_ranges():
+    assert merge_ranges([(5, 8), (1, 3), (2, 4)]) == [(1, 4), (5, 8)]
+    assert merge_ranges([(1, 3), (3, 5)]) == [(1, 5)]
+    assert merge_ranges([(1, 10), (2, 3)]) == [(1, 10)]
+    assert merge_ranges([(4, 4), (6, 5)]) == []
+    assert merge_ranges([]) == []
+
+def test_subtract_ranges():
+    assert subtract_ranges([(0, 10)], []) == [(0, 10)]
+    assert subtract_ranges([(0, 10)], [(3, 5)]) == [(0, 3), (5, 10)]
+    assert subtract_ranges([(0, 10)], [(0, 2), (8, 12)]) == [(2, 8)]
+    assert subtract_ranges([(0, 10)], [(-1, 11)]) == []
+    assert subtract_ranges([(0, 4), (6, 10)], [(3, 7)]) == [(0, 3), (7, 10)]
+    assert subtract_ranges([(0, 10)], [(4, 6), (2, 5)]) == [(0, 2), (6, 10)]
+
+def test_empty_store_misses_the_whole_window(store):
+    assert store.missing_ranges("m1", "2025-01-01", "2025-02-01") == [(ms("2025-01-01"), ms("2025-02-01"))]
+
+def test_synced_window_rereads_from_the_last_reading(store):
+    sync(store, "2025-01-01", "2025-02-01")
+    assert store.missing_ranges("m1", "2025-01-01", "2025-02-01") == [(ms("2025-01-31T23:00:00"), ms("2025-02-01"))]
+    assert store.missing_ranges("m1", "2025-01-05", "2025-01-10") == []
+
+def test_gap_between_synced_windows(store):
+    sync(store, "2025-01-01", "2025-02-01")
+    sync(store, "2025-03-01", "2025-04-01")
+    assert store.synced_ranges("m1") == [(ms("2025-01-01"), ms("2025-02-01")), (ms("2025-03-01"), ms("2025-04-01"))]
+    assert store.missing_ranges("m1", "2025-01-01", "2025-04-01") == [
+        (ms("2025-02-01"), ms("2025-03-01")),
+        (ms("2025-03-31T23:00:00"), ms("2025-04-01")),
+    ]
+
+def test_filling_the_gap_merges_ranges(store):
+    sync(store, "2025-01-01", "2025-02-01")
+    sync(store, "2025-03-01", "2025-04-01")
+    sync(store, "2025-02-01", "2025-03-01")
+    assert store.synced_ranges("m1") == [(ms("2025-01-01"), ms("2025-04-01"))]
+    assert store.missing_ranges("m1", "2025-01-01", "2025-03-15") == []
+
+def test_overlapping_windows_merge(store):
+    sync(store, "2025-01-01", "2025-01-20")
+    sync(store, "2025-01-10", "2025-02-01")
+    assert store.synced_ranges("m1") == [(ms("2025-01-01"), ms("2025-02-01"))]
+
+def test_window_past_the_high_water_is_read_again(store):
+    sync(store, "2025-01-01", "2025-02-01")
+    # Synced, but the API had nothing yet: clipped to the last stored reading
+    store.save_readings("m1", [], [(ms("2025-02-01"), ms("2025-03-01"))])
+    assert store.missing_ranges("m1", "2025-01-01", "2025-03-01") == [(ms("2025-01-31T23:00:00"), ms("2025-03-01"))]
+
+def test_no_readings_means_nothing_is_synced(store):
+    store.save_readings("m1", [], [(ms("2025-01-01"), ms("2025-02-01"))])
+    assert store.missing_ranges("m1", "2025-01-01", "2025-02-01") == [(ms("2025-01-01"), ms("2025-02-01"))]
+
+def test_failed_windows_stay_missing(store):
+    sync(store, "2025-01-01", "2025-02-01", failed=[(ms("2025-01-10"), ms("2025-01-11"))])
+    assert store.missing_ranges("m1", "2025-01-01", "2025-02-01") == [
+        (ms("2025-01-10"), ms("2025-01-11")),
+        (ms("2025-01-31T23:00:00"), ms("2025-02-01")),
+    ]
+
+def test_meters_are_tracked_separately(store):
+    sync(store, "2025-01-01", "2025-02-01")
+    assert store.missing_ranges("m2", "2025-01-01", "2025-02-01") == [(ms("2025-01-01"), ms("2025-02-01"))]
+
+def test_load_readings_is_end_exclusive(store):
+    sync(store, "2025-01-01", "2025-01-02")
+    readings = store.load_readings("m1", "2025-01-01T10:00:00Z", "2025-01-01T12:00:00Z")
+    assert [r["date"] for r in readings] == ["2025-01-01T10:00:00+00:00", "2025-01-01T11:00:00+00:00"]
@@ -0,0 +1,100 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import scheduler
+from scheduler import CronSchedule, Schedule, Scheduler, previous_window, rolling_window
+
+TZ = ZoneInfo("Asia/Dubai")
+
+
+def at(text):
+    return datetime.fromisoformat(text).replace(tzinfo=TZ)
+
+def fires(expr, start, end):
+    return [f.strftime("%Y-%m-%d %H:%M") for f in CronSchedule(expr).fires_between(at(start), at(end))]
+
+
+def test_next_after_is_strictly_after():
+    cron = CronSchedule("30 3 * * *")
+    assert cron.next_after(at("2025-06-01T03:29")) == at("2025-06-01T03:30")
+    assert cron.next_after(at("2025-06-01T03:30")) == at("2025-06-02T03:30")
+
+def test_monthly_fire_rolls_over_the_year():
+    assert CronSchedule("0 2 1 * *").next_after(at("2025-12-01T02:00")) == at("2026-01-01T02:00")
+
+def test_steps_ranges_and_lists():
+    assert fires("*/20 9-10 * * *", "2025-06-01T00:00", "2025-06-01T23:59") == [
+        "2025-06-01 09:00", "2025-06-01 09:20", "2025-06-01 09:40",
+        "2025-06-01 10:00", "2025-06-01 10:20", "2025-06-01 10:40",
+    ]
+    assert fires("0 0 1,15 * *", "2025-06-01T00:00", "2025-07-01T00:00") == ["2025-06-15 00:00", "2025-07-01 00:00"]
+
+def test_day_of_month_or_day_of_week_when_both_are_set():
+    # June 2025: the 13th is a Friday, other Fridays are the 6th, 20th and 27th
+    assert fires("0 0 13 * 5", "2025-06-01T00:00", "2025-06-30T00:00") == [
+        "2025-06-06 00:00", "2025-06-13 00:00", "2025-06-20 00:00", "2025-06-27 00:00",
+    ]
+    assert fires("0 0 10 * 1", "2025-06-01T00:00", "2025-06-17T00:00") == [
+        "2025-06-02 00:00", "2025-06-09 00:00", "2025-06-10 00:00", "2025-06-16 00:00",
+    ]
+
+def test_only_day_of_week_or_only_day_of_month():
+    assert fires("0 0 * * 5", "2025-06-01T00:00", "2025-06-14T00:00") == ["2025-06-06 00:00", "2025-06-13 00:00"]
+    assert fires("0 0 13 * *", "2025-06-01T00:00", "2025-07-31T00:00") == ["2025-06-13 00:00", "2025-07-13 00:00"]
+
+def test_sunday_is_zero_or_seven():
+    assert fires("0 0 * * 0", "2025-06-01T00:00", "2025-06-15T00:00") == fires("0 0 * * 7", "2025-06-01T00:00", "2025-06-15T00:00")
+    assert fires("0 0 * * 0", "2025-06-01T00:00", "2025-06-15T00:00") == ["2025-06-08 00:00", "2025-06-15 00:00"]
+
+def test_day_that_only_some_months_have():
+    assert fires("0 0 31 * *", "2025-01-01T00:00", "2025-06-01T00:00") == [
+        "2025-01-31 00:00", "2025-03-31 00:00", "2025-05-31 00:00",
+    ]
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "0 24 * * *", "0 0 0 * *", "0 0 * 13 *", "0 0 * * 8", "*/0 * * * *", "0 0 30 2 *"])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronSchedule(expr).next_after(at("2025-01-01T00:00"))
+
+def test_rolling_windows():
+    now = at("2025-01-15T03:30:45")
+    assert rolling_window("last_hour", now) == ("2025-01-15T02:00:00.000+04:00", "2025-01-15T03:00:00.000+04:00")
+    assert rolling_window("last_day", now) == ("2025-01-14T00:00:00.000+04:00", "2025-01-15T00:00:00.000+04:00")
+    # 2025-01-15 is a Wednesday: the last full week ran Monday to Monday
+    assert rolling_window("last_week", now) == ("2025-01-06T00:00:00.000+04:00", "2025-01-13T00:00:00.000+04:00")
+    assert rolling_window("last_month", now) == ("2024-12-01T00:00:00.000+04:00", "2025-01-01T00:00:00.000+04:00")
+    with pytest.raises(ValueError):
+        rolling_window("last_year", now)
+
+def test_previous_window_steps_back_whole_months():
+    assert previous_window("2025-01-01T00:00:00.000+04:00", "2025-02-01T00:00:00.000+04:00") == (
+        "2024-12-01T00:00:00.000+04:00", "2025-01-01T00:00:00.000+04:00")
+    assert previous_window("2025-03-01T00:00:00.000+00:00", "2025-04-01T00:00:00.000+00:00") == (
+        "2025-02-01T00:00:00.000+00:00", "2025-03-01T00:00:00.000+00:00")
+    # A quarter steps back a quarter, across the year
+    assert previous_window("2025-01-01", "2025-04-01") == ("2024-10-01T00:00:00.000", "2025-01-01T00:00:00.000")
+
+def test_previous_window_steps_back_other_lengths():
+    assert previous_window("2025-03-01T00:00:00Z", "2025-03-08T00:00:00Z") == (
+        "2025-02-22T00:00:00.000+00:00", "2025-03-01T00:00:00.000+00:00")
+    assert previous_window("2025-01-15T00:00:00Z", "2025-02-15T00:00:00Z") == (
+        "2024-12-15T00:00:00.000+00:00", "2025-01-15T00:00:00.000+00:00")
+
+
+class _JobManager:
+    def submit(self, key, fn):
+        fn(None)
+        return object(), True
+
+def test_catch_up_runs_one_window_over_the_missed_fires(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "CACHE_DIR", str(tmp_path))
+    runs = []
+    schedule = Schedule("daily", "faulty-report", "30 3 * * *", "last_day")
+    sched = Scheduler([schedule], {"faulty-report": lambda **kw: runs.append((kw["start_date"], kw["end_date"]))},
+                      _JobManager(), state_path=str(tmp_path / "state.json"), tz=TZ)
+    sched._state = {"daily": {"handled_until": at("2025-06-01T04:00").isoformat()}}
+    sched.trigger(schedule, at("2025-06-04T03:30"))
+    assert runs == [("2025-06-01T00:00:00.000+04:00", "2025-06-04T00:00:00.000+04:00")]
+    assert sched._state["daily"]["handled_until"] == at("2025-06-04T03:30").isoformat()
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import timestamps
+from timestamps import format_ms, is_text_time, parse_epoch_ms, reading_times, to_datetime
+
+
+def ms(text):
+    # Reference value: naive strings are UTC
+    dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def parsed(values, wall_clock=False):
+    epoch_ms, invalid = parse_epoch_ms(np.array(values, dtype=object), wall_clock=wall_clock)
+    return [None if bad else int(value) for value, bad in zip(epoch_ms, invalid)]
+
+
+@pytest.mark.parametrize("text", [
+    "2025-06-01",
+    "2025-06-01T10:30:00",
+    "2025-06-01 10:30:00",
+    "2025-06-01T10:30:00Z",
+    "2025-06-01T10:30:00.123Z",
+    "2025-06-01T10:30:00.5+04:00",
+    "2025-06-01T10:30:00.123456-02:30",
+    "2024-02-29T23:59:59.999+00:00",
+    "1969-12-31T23:59:59Z",
+    "2000-03-01T00:00:00Z",
+])
+def test_iso_strings_match_fromisoformat(text):
+    assert parsed([text]) == [ms(text)]
+
+def test_compact_and_short_offsets():
+    assert parsed(["2025-06-01T10:30:00+0400", "2025-06-01T10:30:00+04"]) == [ms("2025-06-01T06:30:00Z")] * 2
+
+def test_wall_clock_drops_offsets():
+    values = ["2025-06-01T10:30:00+04:00", "2025-06-01T10:30:00-0230", "2025-06-01T10:30:00Z", "2025-06-01T10:30:00+04"]
+    assert parsed(values, wall_clock=True) == [ms("2025-06-01T10:30:00")] * 4
+
+def test_mixed_offset_styles_do_not_raise():
+    values = ["2025-06-01T10:30:00+04", "2025-06-01T10:30Z"]
+    assert parsed(values, wall_clock=True) == [ms("2025-06-01T10:30:00"), ms("2025-06-01T10:30:00")]
+    assert parsed(values) == [ms("2025-06-01T06:30:00Z"), ms("2025-06-01T10:30:00Z")]
+
+def test_trailing_whitespace_keeps_wall_clock():
+    assert parsed(["2025-06-01T10:30:00+04:00 "], wall_clock=True) == [ms("2025-06-01T10:30:00")]
+    assert parsed(["2025-06-01T10:30:00+04:00 "]) == [ms("2025-06-01T06:30:00Z")]
+
+def test_date_only_is_not_mistaken_for_an_offset():
+    assert parsed(["2025-06-15"], wall_clock=True) == [ms("2025-06-15")]
+
+@pytest.mark.parametrize("text", [
+    "2025-02-30T00:00:00Z",
+    "2025-13-01T00:00:00Z",
+    "2025-06-01T24:00:00Z",
+    "2025-06-01T10:60:00Z",
+    "2025-06-01T10:30:00+04:00:00",
+    "2025-06-01X10:30:00",
+    "garbage",
+    "",
+])
+def test_invalid_strings_are_flagged(text):
+    assert parsed([text]) == [None]
+    assert parsed([text], wall_clock=True) == [None]
+
+def test_epoch_numbers_and_digit_strings():
+    value = ms("2025-06-01T10:00:00Z")
+    assert parsed([value, float(value), str(value)]) == [value, value, value]
+
+def test_numeric_arrays_skip_text_parsing():
+    epoch_ms, invalid = parse_epoch_ms(np.array([1, np.nan, 3.0]))
+    assert epoch_ms.dtype == np.int64
+    assert list(invalid) == [False, True, False]
+    assert list(epoch_ms[~invalid]) == [1, 3]
+    epoch_ms, invalid = parse_epoch_ms(pd.Series([5, 6]))
+    assert list(epoch_ms) == [5, 6] and not invalid.any()
+
+def test_mixed_batch_with_missing_values():
+    value = ms("2025-06-01T10:00:00Z")
+    assert parsed(["2025-06-01T10:00:00Z", value, None, float("nan"), "nope"]) == [value, value, None, None, None]
+
+def test_non_ascii_text_falls_back_per_row():
+    assert parsed(["2025-06-01T10:00:00Z", "2025-06-01T10:00:00Z é"]) == [ms("2025-06-01T10:00:00Z"), None]
+
+def test_batch_errors_fall_back_to_single_values(monkeypatch):
+    real = timestamps._to_naive_utc
+
+    def fussy(text, wall_clock):
+        if len(text) > 1:
+            raise ValueError("Mixed timezones detected")
+        return real(text, wall_clock)
+
+    monkeypatch.setattr(timestamps, "_to_naive_utc", fussy)
+    assert parsed(["2025-06-01T10:30:00+04", "2025-06-01T10:30:00+04", "junk"]) == [ms("2025-06-01T06:30:00Z")] * 2 + [None]
+
+def test_fast_path_matches_fromisoformat_on_a_range():
+    start = datetime(1999, 12, 25, tzinfo=timezone.utc)
+    values = [(start + timedelta(hours=7 * i, milliseconds=i)).isoformat(timespec="milliseconds") for i in range(5000)]
+    assert parsed(values) == [ms(v) for v in values]
+
+def test_empty_batches():
+    for values in ([], np.array([], dtype=object), pd.Series([], dtype=object)):
+        epoch_ms, invalid = parse_epoch_ms(values)
+        assert len(epoch_ms) == 0 and len(invalid) == 0
+
+def test_reading_times_uses_first_set_field():
+    readings = [{"date": "2025-06-01T00:00:00Z"}, {"time": 1000}, {"timestamp": "2025-06-01"}, {"value": 1}]
+    epoch_ms, invalid = reading_times(readings)
+    assert list(invalid) == [False, False, False, True]
+    assert list(epoch_ms[:3]) == [ms("2025-06-01T00:00:00Z"), 1000, ms("2025-06-01")]
+
+def test_format_and_datetime_helpers():
+    epoch_ms = np.array([ms("2025-06-01T10:30:00Z"), 0])
+    invalid = np.array([False, True])
+    assert list(format_ms(epoch_ms, invalid, fallback="n/a")) == ["2025-06-01 10:30:00", "n/a"]
+    times = to_datetime(epoch_ms, invalid, utc=True)
+    assert str(times.dt.tz) == "UTC" and pd.isna(times[1])
+
+def test_is_text_time():
+    assert list(is_text_time(["2025-06-01", "1748772000000", 5, None, " 1.5e3 "])) == [True, False, False, False, False]
@@ -0,0 +1,215 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Batch timestamp parsing shared by the report pipelines. A batch of ISO strings and/or
+# epoch milliseconds becomes one int64 epoch-ms array plus a mask of entries that could
+# not be parsed; nothing raises per value.
+
+# Trailing UTC offset ("Z", "+04", "+0400", "+04:00", maybe followed by spaces), dropped
+# when keeping the wall-clock time the API reported. Only stripped after a time of day,
+# so the day of a date-only "2025-06-15" is not mistaken for an offset.
+TZ_SUFFIX = r"(?<=[T ]\d{2}:\d{2})((?::\d{2})?(?:[.,]\d+)?)\s*(?:Z|[+-]\d{2}(?::?\d{2})?)?\s*$"
+DISPLAY_FORMAT = "%Y-%m-%d %H:%M:%S"
+READING_TIME_FIELDS = ("date", "time", "timestamp")
+MS_PER_DAY = 86_400_000
+
+_NUMBER = re.compile(r"\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*")
+_DIGIT, _DASH, _COLON, _DOT, _PLUS, _SPACE, _T, _Z = (ord(c) for c in "0-:.+ TZ")
+
+
+def _days_from_civil(y, m, d):
+    # Days since 1970-01-01 for proleptic Gregorian dates (H. Hinnant's algorithm)
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    doy = (153 * np.where(m > 2, m - 3, m + 9) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def _char_matrix(text):
+    # (n, width) uint8 character codes of an 'S' or 'U' array; None if not plain ASCII
+    n = len(text)
+    if text.dtype.kind == "S":
+        return text.view(np.uint8).reshape(n, text.dtype.itemsize)
+    codes = text.view(np.uint32).reshape(n, text.dtype.itemsize // 4)
+    if codes.size and codes.max() > 127:
+        return None
+    return codes.astype(np.uint8)
+
+def _parse_iso_fixed(chars, wall_clock):
+    # Vectorised parse of "YYYY-MM-DD", "YYYY-MM-DD[T ]HH:MM:SS[.fff...]" with an
+    # optional "Z", "±HH:MM" or "±HHMM" suffix. Returns (epoch_ms, ok); rows in any
+    # other shape are left for the general parser.
+    n, width = chars.shape
+    # One contiguous row per character position, zero padded past the longest string
+    cols = np.zeros((max(width, 32) + 6, n), dtype=np.uint8)
+    cols[:width] = chars.T
+    digits = cols - np.uint8(_DIGIT)
+    rows = np.arange(n)
+
+    def at(pos, source=cols):
+        return source[pos, rows] if isinstance(pos, np.ndarray) else source[pos]
+
+    def is_digit(pos):
+        return at(pos, digits) < 10
+
+    def number(*positions):
+        value = np.zeros(n, dtype=np.int32)
+        for pos in positions:
+            value = value * 10 + at(pos, digits)
+        return value
+
+    ok = (at(4) == _DASH) & (at(7) == _DASH)
+    for pos in (0, 1, 2, 3, 5, 6, 8, 9):
+        ok &= is_digit(pos)
+    year, month, day = number(0, 1, 2, 3), number(5, 6), number(8, 9)
+
+    has_time = (at(10) == _T) | (at(10) == _SPACE)
+    time_ok = (at(13) == _COLON) & (at(16) == _COLON)
+    for pos in (11, 12, 14, 15, 17, 18):
+        time_ok &= is_digit(pos)
+    hour = np.where(has_time, number(11, 12), 0)
+    minute = np.where(has_time, number(14, 15), 0)
+    second = np.where(has_time, number(17, 18), 0)
+    ok &= ~has_time | time_ok
+
+    # Fraction of a second: any number of digits, milliseconds kept
+    has_frac = has_time & (at(19) == _DOT)
+    frac_len = np.zeros(n, dtype=np.int64)
+    still_digit = has_frac.copy()
+    millis = np.zeros(n, dtype=np.int32)
+    for k in range(9):
+        still_digit &= is_digit(20 + k)
+        frac_len += still_digit
+        if k < 3:
+            millis = millis * 10 + np.where(still_digit, at(20 + k, digits), 0)
+    ok &= ~has_frac | (frac_len > 0)
+
+    # Suffix: nothing, Z, or a ±HH[:]MM offset
+    end = np.where(has_frac, 20 + frac_len, np.where(has_time, 19, 10))
+    first = at(end)
+    is_z = first == _Z
+    signed = (first == _PLUS) | (first == _DASH)
+    colon = signed & (at(end + 3) == _COLON)
+    off_digits = [end + 1, end + 2, np.where(colon, end + 4, end + 3), np.where(colon, end + 5, end + 4)]
+    offset_ok = signed
+    for pos in off_digits:
+        offset_ok &= is_digit(pos)
+    offset_minutes = np.where(
+        offset_ok, number(off_digits[0], off_digits[1]) * 60 + number(off_digits[2], off_digits[3]), 0
+    ) * np.where(first == _DASH, -1, 1)
+    after = np.where(is_z, end + 1, np.where(offset_ok, np.where(colon, end + 6, end + 5), end))
+    ok &= ((first == 0) | is_z | offset_ok) & (at(after) == 0)
+
+    days = _days_from_civil(year, month, day).astype(np.int64)
+    month_length = _days_from_civil(year + (month == 12), month % 12 + 1, 1) - _days_from_civil(year, month, 1)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= np.where(ok, month_length, 31))
+    ok &= (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    epoch_ms = days * MS_PER_DAY + (((hour * 60 + minute) * 60 + second) * 1000 + millis)
+    if not wall_clock:
+        epoch_ms -= offset_minutes * 60_000
+    return np.where(ok, epoch_ms, 0), ok
+
+def _parse_text_general(text, wall_clock):
+    # pandas fallback for numeric strings and ISO shapes the fixed parser skips
+    series = pd.Series(text, dtype=object)
+    epoch_ms = np.zeros(len(series), dtype=np.int64)
+    ok = np.zeros(len(series), dtype=bool)
+    numeric = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    finite = np.isfinite(numeric)
+    epoch_ms[finite] = numeric[finite].astype(np.int64)
+    ok |= finite
+    rest = ~finite
+    if rest.any():
+        text = series[rest].astype(str).str.strip()
+        if wall_clock:
+            text = text.str.replace(TZ_SUFFIX, r"\1", regex=True)
+        try:
+            parsed = _to_naive_utc(text, wall_clock)
+        except (ValueError, TypeError, OverflowError):
+            # e.g. zones pandas can't reconcile in one batch: parse value by value instead
+            parsed = pd.Series([_parse_one(v, wall_clock) for v in text], index=text.index, dtype="datetime64[ns]")
+        parsed_ok = parsed.notna().to_numpy()
+        positions = np.flatnonzero(rest)[parsed_ok]
+        epoch_ms[positions] = parsed[parsed_ok].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        ok[positions] = True
+    return epoch_ms, ok
+
+def _to_naive_utc(text, wall_clock):
+    if wall_clock:
+        return pd.to_datetime(text, format="ISO8601", errors="coerce")
+    return pd.to_datetime(text, format="ISO8601", errors="coerce", utc=True).dt.tz_localize(None)
+
+def _parse_one(value, wall_clock):
+    try:
+        parsed = _to_naive_utc(pd.Series([value], dtype=object), wall_clock).iloc[0]
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    # An offset the suffix pattern left in place still reads as wall-clock time
+    return parsed.tz_localize(None) if parsed is not pd.NaT and parsed.tzinfo is not None else parsed
+
+def _parse_text(text, wall_clock):
+    text = np.asarray(text)
+    chars = _char_matrix(text) if len(text) else None
+    if chars is None:
+        return _parse_text_general(text.astype(object), wall_clock)
+    epoch_ms, ok = _parse_iso_fixed(chars, wall_clock)
+    if not ok.all():
+        rest = ~ok
+        rest_ms, rest_ok = _parse_text_general(text[rest].astype(str).astype(object), wall_clock)
+        epoch_ms[rest] = rest_ms
+        ok[rest] = rest_ok
+    return epoch_ms, ok
+
+def parse_epoch_ms(values, wall_clock=False):
+    # Returns (int64 epoch ms, invalid mask). wall_clock=True drops UTC offsets from ISO
+    # strings instead of converting to UTC ("10:00+04:00" stays 10:00); naive strings
+    # and epoch numbers are taken as UTC either way.
+    arr = values.to_numpy() if isinstance(values, (pd.Series, pd.Index)) else np.asarray(values)
+    n = len(arr)
+    if arr.dtype.kind in "iu":
+        return arr.astype(np.int64), np.zeros(n, dtype=bool)
+    if arr.dtype.kind == "f":
+        finite = np.isfinite(arr)
+        return np.where(finite, arr, 0).astype(np.int64), ~finite
+    if arr.dtype.kind == "M":
+        invalid = np.isnat(arr)
+        return np.where(invalid, 0, arr.astype("datetime64[ms]").astype(np.int64)), invalid
+    if arr.dtype.kind in "US":
+        epoch_ms, ok = _parse_text(arr, wall_clock)
+        return epoch_ms, ~ok
+
+    # Mixed object batch: strings one way, numbers (and None/NaN) the other
+    epoch_ms = np.zeros(n, dtype=np.int64)
+    ok = np.zeros(n, dtype=bool)
+    is_text = np.fromiter((isinstance(v, str) for v in arr), dtype=bool, count=n)
+    if is_text.any():
+        epoch_ms[is_text], ok[is_text] = _parse_text(arr[is_text].astype(str), wall_clock)
+    if not is_text.all():
+        numeric = pd.to_numeric(pd.Series(arr[~is_text]), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        finite = np.isfinite(numeric)
+        positions = np.flatnonzero(~is_text)
+        epoch_ms[positions[finite]] = numeric[finite].astype(np.int64)
+        ok[positions[finite]] = True
+    return epoch_ms, ~ok
+
+def is_text_time(values):
+    # ISO-style entries, as opposed to epoch numbers (given as numbers or digit strings)
+    return np.fromiter((isinstance(v, str) and not _NUMBER.fullmatch(v) for v in values), dtype=bool, count=len(values))
+
+def reading_times(readings, wall_clock=False):
+    # Epoch ms for API reading dicts, from the first of date/time/timestamp that is set
+    raw = [next((r.get(f) for f in READING_TIME_FIELDS if r.get(f)), None) for r in readings]
+    return parse_epoch_ms(np.array(raw, dtype=object), wall_clock=wall_clock)
+
+def to_datetime(epoch_ms, invalid, utc=False):
+    times = pd.Series(np.where(invalid, 0, epoch_ms).astype("datetime64[ms]")).astype("datetime64[ns]")
+    times = times.where(~invalid)
+    return times.dt.tz_localize("UTC") if utc else times
+
+def format_ms(epoch_ms, invalid, fmt=DISPLAY_FORMAT, fallback=None):
+    # Vectorised strftime; invalid entries become `fallback`
+    formatted = to_datetime(epoch_ms, invalid).dt.strftime(fmt)
+    return formatted.where(~invalid, fallback)
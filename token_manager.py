@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from common import CACHE_DIR, save_json
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process lock; at worst two processes refresh at the same time
+    fcntl = None
+
+AUTH_URL = os.getenv("C3NTINEL_AUTH_URL", "https://auth.c3ntinel.com/sso/oauth/token")
+# Refresh this many seconds before the token actually expires
+REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+DEFAULT_EXPIRES_IN = 3600
+
+_issued = {}
+_issued_lock = threading.Lock()
+
+
+def manager_for(token):
+    # Which manager issued this bearer token, if any
+    with _issued_lock:
+        return _issued.get(token)
+
+def _register(token, manager):
+    with _issued_lock:
+        if len(_issued) > 1000:
+            _issued.clear()
+        _issued[token] = manager
+
+
+class TokenManager:
+    # Caches a client-credentials token in memory and in a shared file, so the API
+    # process, its jobs and separate CLI runs reuse one token until it nears expiry.
+    def __init__(self, client_id, client_secret, auth_url=AUTH_URL, cache_dir=CACHE_DIR, margin=REFRESH_MARGIN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.auth_url = auth_url
+        self.margin = margin
+        key = hashlib.sha1(f"{auth_url}|{client_id}".encode("utf-8")).hexdigest()[:12]
+        self.cache_path = os.path.join(cache_dir, f"token-{key}.json") if cache_dir else None
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self._token is not None and time.time() < self._expires_at - self.margin
+
+    def get_token(self):
+        if self._fresh():
+            return self._token
+        with self._lock:
+            if not self._fresh():
+                self._refresh_locked(stale=None)
+            return self._token
+
+    def refresh(self, stale):
+        # Called after a 401; only one caller refreshes a given stale token
+        with self._lock:
+            if self._token != stale and self._fresh():
+                return self._token
+            self._refresh_locked(stale=stale)
+            return self._token
+
+    def _refresh_locked(self, stale):
+        with self._file_lock():
+            cached = self._read_cache()
+            if cached and cached["access_token"] != stale and time.time() < cached["expires_at"] - self.margin:
+                self._set(cached["access_token"], cached["expires_at"])
+                return
+            token, expires_at = self._fetch()
+            self._set(token, expires_at)
+            self._write_cache()
+
+    def _set(self, token, expires_at):
+        self._token = token
+        self._expires_at = expires_at
+        _register(token, self)
+
+    def _fetch(self):
+        # Imported here: the client looks tokens up in this module on every request
+        from c3ntinel_client import get_client
+        payload = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        r = get_client().post(self.auth_url, data=payload, headers=headers)
+        r.raise_for_status()
+        data = r.json()
+        expires_in = float(data.get("expires_in") or DEFAULT_EXPIRES_IN)
+        return data["access_token"], time.time() + expires_in
+
+    def _read_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self):
+        if not self.cache_path:
+            return
+        save_json(self.cache_path, {"access_token": self._token, "expires_at": self._expires_at}, mode=0o600)
+
+    def _file_lock(self):
+        return _FileLock(f"{self.cache_path}.lock" if self.cache_path and fcntl else None)
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_token_manager(client_id, client_secret, auth_url=AUTH_URL):
+    with _managers_lock:
+        manager = _managers.get((auth_url, client_id))
+        if manager is None:
+            manager = _managers[(auth_url, client_id)] = TokenManager(client_id, client_secret, auth_url)
+        return manager